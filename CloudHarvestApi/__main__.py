@@ -1,25 +1,35 @@
 """
 Entrypoint for the CloudHarvestApi
 """
-from CloudHarvestApi.startup import (
-    load_configuration_from_file,
-    load_logging,
-    load_silos,
-    start_node_heartbeat
-)
-from CloudHarvestCorePluginManager import Registry, register_all
-from CloudHarvestCorePluginManager.plugins import generate_plugins_file, install_plugins
-from CloudHarvestCoreTasks.dataset import WalkableDict
-from CloudHarvestCoreTasks.environment import Environment
-from argparse import ArgumentParser, Namespace
-from flask import Flask
-from os import getpid
-
-# Imports objects which need to be registered by the CloudHarvestCorePluginManager
-from CloudHarvestApi.__register__ import *
+from CloudHarvestApi.startup import StartupProfiler
+
+# Times each phase of startup; set CLOUDHARVESTAPI_PROFILE_STARTUP to log the report at INFO
+profiler = StartupProfiler()
+
+with profiler.phase('imports'):
+    from CloudHarvestApi.blueprints.base import HarvestJSONProvider
+    from CloudHarvestApi.startup import (
+        install_plugins_once,
+        load_configuration_from_file,
+        load_logging,
+        load_silos,
+        start_node_heartbeat,
+        start_regions_warmer
+    )
+    from CloudHarvestCorePluginManager import Registry, register_all
+    from CloudHarvestCoreTasks.dataset import WalkableDict
+    from CloudHarvestCoreTasks.environment import Environment
+    from argparse import ArgumentParser, Namespace
+    from flask import Flask
+    from os import environ, getpid
+    from platform import node
+
+    # Imports objects which need to be registered by the CloudHarvestCorePluginManager
+    from CloudHarvestApi.__register__ import *
 
 # The flask server object
 app = Flask('CloudHarvestApi')
+app.json = HarvestJSONProvider(app)
 
 if __name__ == '__main__':
     parser = ArgumentParser(description='CloudHarvestApi')
@@ -36,35 +46,37 @@ if __name__ == '__main__':
 
 else:
     # If the script is not run as the main module, collect the variables from the environment
-    from os import environ
     args = Namespace(host=environ.get('CLOUDHARVESTAPI_HOST'),
                      port=int(environ.get('CLOUDHARVESTAPI_PORT')),
                      pemfile=environ.get('CLOUDHARVESTAPI_PEMFILE'),
                      debug=False)
 
 # Load the configuration
-config = WalkableDict(**load_configuration_from_file())
-config['api']['connection'] = vars(args)
-config['api']['pid'] = getpid()
-config['api']['name'] = ':'.join([
-    'api',
-    args.host,
-    str(args.port),
-    str(getpid())
-])
-
-# Makes the configuration available throughout the app
-Environment.merge(config)
-
-# Install plugins
-generate_plugins_file(config.get('plugins') or {})
-install_plugins(quiet=args.debug or config.walk('api.logging.quiet'))
+with profiler.phase('config'):
+    config = WalkableDict(**load_configuration_from_file())
+    config['api']['connection'] = vars(args)
+    config['api']['pid'] = getpid()
+    # The hostname distinguishes nodes which bind the same address, such as containers listening on 0.0.0.0:8000
+    config['api']['name'] = ':'.join([
+        'api',
+        node(),
+        args.host,
+        str(args.port)
+    ])
+
+    # Makes the configuration available throughout the app
+    Environment.merge(config)
+
+# Install plugins, unless this plugin configuration has already been installed on this host
+with profiler.phase('plugins'):
+    install_plugins_once(config.get('plugins') or {}, quiet=args.debug or config.walk('api.logging.quiet'))
 
 # Find all plugins and register their objects and templates
-register_all()
+with profiler.phase('registry'):
+    register_all()
 
 # Register the blueprints from this app and all plugins
-with app.app_context():
+with profiler.phase('blueprints'), app.app_context():
     [
         app.register_blueprint(api_blueprint)
         for api_blueprint in Registry.find(result_key='instances',
@@ -75,20 +87,44 @@ with app.app_context():
 
 
 # Configure logging
-logger = load_logging(log_destination=config.walk('api.logging.location'),
-                      log_level=config.walk('api.logging.level'),
-                      quiet=config.walk('api.logging.quiet'))
+with profiler.phase('logging'):
+    logger = load_logging(log_destination=config.walk('api.logging.location'),
+                          log_level=config.walk('api.logging.level'),
+                          quiet=config.walk('api.logging.quiet'))
 
 logger.info('Api configuration loaded successfully.')
 
-# Load the silos
-load_silos(config.get('silos') or {})
 
-# Start the node heartbeat
-start_node_heartbeat(config)
+def start_worker():
+    """
+    Starts the parts of the application which cannot be shared across a fork: silo connections and background
+    threads. When gunicorn preloads the application, this is called in each worker by the `post_fork` hook.
+    """
 
-logger.debug(app.url_map)
-logger.info('Api node started.')
+    config['api']['pid'] = getpid()
+
+    # Load the silos
+    with profiler.phase('silos'):
+        load_silos(config.get('silos') or {}, timeout=config.walk('api.silos.timeout') or 30)
+
+    with profiler.phase('heartbeat'):
+        # Start the node heartbeat
+        start_node_heartbeat(config)
+
+        # Keep the platform regions catalog up to date
+        start_regions_warmer(config)
+
+    logger.debug(app.url_map)
+    profiler.log(logger)
+    logger.info('Api node started.')
+
+
+# When preloaded by the gunicorn master, the workers start themselves after they are forked
+if not environ.get('CLOUDHARVESTAPI_PRELOAD'):
+    start_worker()
+
+else:
+    profiler.log(logger)
 
 if args.debug:
     import ssl
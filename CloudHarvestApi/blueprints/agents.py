@@ -1,8 +1,13 @@
 from CloudHarvestCoreTasks.blueprints import HarvestApiBlueprint
 from flask import Response, jsonify
+from json import loads
 from logging import getLogger
+from threading import Lock
+from time import monotonic
 
+from CloudHarvestApi.blueprints.base import RedisRequest, content_version
 from CloudHarvestApi.blueprints.home import not_implemented_error
+from CloudHarvestApi.blueprints.templates import TemplateCatalog
 
 logger = getLogger('harvest')
 
@@ -11,6 +16,210 @@ agents_blueprint = HarvestApiBlueprint(
     url_prefix='/agents'
 )
 
+
+class AgentDirectory:
+    """
+    An in-process index of the agents registered in the `harvest-nodes` silo, the platform accounts they serve, and the
+    task templates they can run.
+
+    The directory is built with a SCAN of the agent keys followed by a single pipelined fetch of their configurations.
+    It is rebuilt once it is older than `valid_age` seconds or when an agent joins or leaves the silo, so warm reads do
+    not make any Redis round trips. The template catalog is only rebuilt when an agent's templates have changed.
+    """
+
+    def __init__(self, silo: str = 'harvest-nodes', key_pattern: str = 'agent*', valid_age: int = 30):
+        self.silo = silo
+        self.key_pattern = key_pattern
+        self.valid_age = valid_age
+
+        self._lock = Lock()
+        self._expires = 0
+        self._listening = False
+        self._template_sources = {}
+
+        self.agents = {}            # agent name -> agent configuration
+        self.accounts = {}          # platform -> sorted list of accounts
+        self.templates = TemplateCatalog()
+
+        # Content hashes of the accounts index and template catalog, which change only when their contents do
+        self.accounts_version = content_version(self.accounts)
+        self.templates_version = content_version(self._template_sources)
+
+    @property
+    def is_valid(self) -> bool:
+        return monotonic() < self._expires
+
+    def invalidate(self):
+        """
+        Marks the directory as stale so the next read rebuilds it.
+        """
+        self._expires = 0
+
+    def get_accounts(self, platform: str = None) -> list:
+        """
+        Returns the accounts served by the agents.
+
+        Arguments
+        platform (str, optional): When provided, only accounts on this platform are returned.
+
+        Returns
+        list: A list of {'platform': str, 'account': str} dictionaries sorted by platform and account.
+        """
+        accounts = self.refresh()
+
+        return [
+            {
+                'platform': p,
+                'account': account
+            }
+            for p in sorted(accounts.keys())
+            if platform is None or p == platform
+            for account in accounts[p]
+        ]
+
+    def get_platforms(self) -> list:
+        """
+        Returns the sorted list of platforms served by the agents.
+        """
+        return sorted(self.refresh().keys())
+
+    def refresh(self, force: bool = False) -> dict:
+        """
+        Rebuilds the directory if it is stale. Concurrent callers wait for a single rebuild rather than each querying
+        Redis.
+
+        Arguments
+        force (bool, optional): Rebuild the directory even if it is still valid. Defaults to False.
+
+        Returns
+        dict: The platform -> accounts index.
+        """
+
+        if self.is_valid and not force:
+            return self.accounts
+
+        with self._lock:
+            # Another thread may have rebuilt the directory while we waited for the lock
+            if self.is_valid and not force:
+                return self.accounts
+
+            self._listen()
+
+            redis_request = RedisRequest(self.silo)
+
+            names = []
+            cursor = 0
+            while True:
+                cursor, batch = redis_request.scan(cursor=cursor, match=self.key_pattern, count=100)
+                names.extend(batch)
+
+                if cursor == 0:
+                    break
+
+            pipeline = redis_request.pipeline(transaction=False)
+            for name in names:
+                pipeline.hmget(name, ['accounts', 'available_templates'])
+
+            agents = {}
+            accounts = {}
+            for name, (agent_accounts, agent_templates) in zip(names, pipeline.execute()):
+                try:
+                    agent_accounts = loads(agent_accounts or '[]') or []
+
+                except Exception as ex:
+                    logger.warning(f'{name}: could not read agent accounts: {ex}')
+                    agent_accounts = []
+
+                agents[name] = {
+                    'accounts': agent_accounts,
+                    'available_templates': agent_templates
+                }
+
+                for account in agent_accounts:
+                    if account is not None and ':' in account:
+                        p, a = account.split(':', 1)
+                        accounts.setdefault(p, set()).add(a)
+
+            # The catalog is only rebuilt when the raw template lists advertised by the agents have changed
+            template_sources = {n: a['available_templates'] for n, a in agents.items()}
+            if template_sources != self._template_sources:
+                self.templates = self._build_templates(agents)
+                self._template_sources = template_sources
+                self.templates_version = content_version(template_sources)
+
+            self.agents = agents
+            self.accounts = {
+                p: sorted(a)
+                for p, a in accounts.items()
+            }
+            self.accounts_version = content_version(self.accounts)
+
+            self._expires = monotonic() + self.valid_age
+
+            logger.debug('%s: agent directory refreshed with %s agents', self.silo, len(agents))
+
+            return self.accounts
+
+    @staticmethod
+    def _build_templates(agents: dict) -> TemplateCatalog:
+        templates = []
+        for name, agent in agents.items():
+            try:
+                templates.extend(loads(agent['available_templates'] or '[]') or [])
+
+            except Exception as ex:
+                logger.warning(f'{name}: could not read agent templates: {ex}')
+
+        logger.debug(f'Template catalog rebuilt with {len(templates)} templates')
+
+        return TemplateCatalog(templates)
+
+    def get_accounts_version(self) -> str:
+        """
+        Returns the content hash of the platform accounts, refreshing the directory if it is stale.
+        """
+        self.refresh()
+
+        return self.accounts_version
+
+    def get_templates_version(self) -> str:
+        """
+        Returns the content hash of the template catalog, refreshing the directory if it is stale.
+        """
+        self.refresh()
+
+        return self.templates_version
+
+    def get_templates(self) -> TemplateCatalog:
+        """
+        Returns the catalog of task templates available on the agents.
+        """
+        self.refresh()
+
+        return self.templates
+
+    def _listen(self):
+        """
+        Subscribes the directory to agent keyspace events so that agents joining or leaving invalidate it immediately.
+        """
+
+        from CloudHarvestApi.blueprints.events import agent_event_listener
+
+        if self._listening:
+            return
+
+        def on_agent_event(name: str, event_name: str):
+            # Heartbeats of known agents do not change the directory
+            if name is None or name not in self.agents or event_name in ('del', 'expired'):
+                self.invalidate()
+
+        agent_event_listener.add_callback(on_agent_event)
+        self._listening = True
+
+
+# One directory per process shared by all endpoints
+agent_directory = AgentDirectory()
+
 @agents_blueprint.route(rule='/get_status', methods=['GET'])
 def get_agent_status():
     return not_implemented_error()
@@ -1,8 +1,22 @@
-from CloudHarvestCoreTasks.cache import CachedData
-from CloudHarvestCoreTasks.silos import BaseSilo
+from CloudHarvestCoreTasks.environment import Environment
+from CloudHarvestCoreTasks.silos import BaseSilo, get_silo
 
-from flask import Request, Response, jsonify
-from logging import getLogger
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from datetime import date
+from flask import Request, Response, current_app, has_request_context, jsonify, request, stream_with_context
+from flask.json.provider import JSONProvider
+from functools import wraps
+from hashlib import sha256
+from inspect import signature
+from itertools import count
+from json import dumps, loads
+from logging import DEBUG, getLogger
+from os import getpid
+from random import uniform
+from threading import Event, Lock
+from time import monotonic, perf_counter, sleep
+from traceback import format_exc
 from typing import Any
 
 logger = getLogger('harvest')
@@ -24,12 +38,22 @@ def safe_request_get_json(request: Request) -> dict:
 
 
 def safe_jsonify(success: bool, reason: str, result: Any, default: Any = None) -> Response:
+    payload = {
+        'success': success,
+        'reason': reason,
+        'result': result
+    }
+
     try:
-        try_result = jsonify({
-            'success': success,
-            'reason': reason,
-            'result': result
-        })
+        # Large results are encoded incrementally rather than as a single string. The status fields are written after
+        # the result so that they can report an error raised while the result is being streamed.
+        if is_large_result(result):
+            return stream_jsonify({'result': result, 'success': success, 'reason': reason},
+                                  on_error=lambda ex: {'success': False,
+                                                       'reason': f'Failed to stream the result: {ex}'})
+
+        try_result = jsonify(payload)
+        try_result.harvest_success = bool(success)
 
     except Exception as ex:
         try_result = jsonify({
@@ -40,11 +64,400 @@ def safe_jsonify(success: bool, reason: str, result: Any, default: Any = None) -
 
     return try_result
 
+
+def is_successful(response: Response) -> bool:
+    """
+    Returns True if a buffered response reports `success`. The outcome is read from the `harvest_success` attribute set
+    by `safe_jsonify`, so the body is not decoded again; responses without it are treated as failed.
+    """
+
+    return response.status_code == 200 and getattr(response, 'harvest_success', False)
+
+
+def get_stream_threshold() -> int:
+    """
+    Returns `api.json.stream_threshold`, the number of list items above which a result is streamed.
+    """
+
+    return ((Environment.get('api') or {}).get('json') or {}).get('stream_threshold') or 1000
+
+
+def is_large_result(result: Any) -> bool:
+    """
+    Returns True if a result should be streamed: it (or one of its top-level values) is an iterator, or a list with more
+    items than `api.json.stream_threshold`.
+    """
+
+    if isinstance(result, Iterator):
+        return True
+
+    threshold = get_stream_threshold()
+
+    if isinstance(result, dict):
+        return any(
+            isinstance(value, Iterator) or (isinstance(value, (list, tuple)) and len(value) > threshold)
+            for value in result.values()
+        )
+
+    return isinstance(result, (list, tuple)) and len(result) > threshold
+
+
+class RawJSON(bytes):
+    """
+    A value which is already encoded as JSON, such as a record read from Redis. `stream_jsonify` writes it as is rather
+    than decoding and encoding it again.
+    """
+
+
+def stream_jsonify(payload: Any, buffer_size: int = 65536, on_error=None) -> Response:
+    """
+    Returns a streamed JSON response. Dictionaries and lists are encoded one item at a time and written in chunks of
+    about `buffer_size` bytes, so the complete document is never held in memory. Lists may be replaced by generators,
+    and values already encoded as JSON may be passed as `RawJSON`.
+
+    The status of a streamed response is sent before its body, so an error raised while encoding cannot change it.
+    Instead, the open lists and dictionaries are closed so that the document remains valid JSON and, when the payload
+    is a dictionary, the fields returned by `on_error` are added to it.
+
+    Arguments
+    payload (Any): The document to encode.
+    buffer_size (int, optional): The approximate size of each chunk written. Defaults to 65536.
+    on_error (Callable[[Exception], dict], optional): Returns the fields added to the payload when encoding fails.
+    """
+
+    dumpb = get_json_dumpb()
+
+    # The closing bytes of the lists and dictionaries which are open, and whether a dictionary key awaits its value
+    open_containers = []
+    awaiting_value = False
+
+    def encode(obj):
+        nonlocal awaiting_value
+
+        if isinstance(obj, RawJSON):
+            yield obj
+
+        elif isinstance(obj, dict):
+            open_containers.append(b'}')
+            yield b'{'
+
+            for i, (key, value) in enumerate(obj.items()):
+                yield (b',' if i else b'') + dumpb(str(key)) + b':'
+                awaiting_value = True
+
+                yield from encode(value)
+
+            open_containers.pop()
+            yield b'}'
+
+        elif isinstance(obj, Iterable) and not isinstance(obj, (str, bytes, bytearray)):
+            open_containers.append(b']')
+            yield b'['
+
+            for i, item in enumerate(obj):
+                if i:
+                    yield b','
+
+                yield from encode(item)
+
+            open_containers.pop()
+            yield b']'
+
+        else:
+            yield dumpb(obj)
+
+    def terminate(ex: Exception) -> bytes:
+        """
+        Returns the bytes which close the document after an error.
+        """
+        closing = bytearray(b'null' if awaiting_value else b'')
+
+        # Everything but the payload itself is closed; the payload receives the error fields first
+        for container in reversed(open_containers[1:]):
+            closing += container
+
+        if open_containers and open_containers[0] == b'}' and on_error is not None:
+            for key, value in on_error(ex).items():
+                closing += b',' + dumpb(str(key)) + b':' + dumpb(value)
+
+        if open_containers:
+            closing += open_containers[0]
+
+        return bytes(closing)
+
+    def generate():
+        nonlocal awaiting_value
+
+        buffer = bytearray()
+
+        try:
+            for chunk in encode(payload):
+                # Any chunk after a dictionary key starts its value; `encode` marks the key only once it resumes
+                awaiting_value = False
+
+                buffer += chunk
+
+                if len(buffer) >= buffer_size:
+                    yield bytes(buffer)
+                    buffer.clear()
+
+        except Exception as ex:
+            logger.error(f'Failed to stream a response: {ex}\n{format_exc()}')
+            buffer += terminate(ex)
+
+        if buffer:
+            yield bytes(buffer)
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+
+def get_json_dumpb():
+    """
+    Returns a function which encodes an object as JSON bytes using the application's JSON provider.
+    """
+
+    provider = current_app.json
+
+    if hasattr(provider, 'dumpb'):
+        return provider.dumpb
+
+    return lambda obj: provider.dumps(obj).encode()
+
+
+class HarvestJSONProvider(JSONProvider):
+    """
+    A JSON provider which encodes responses with `orjson` when it is installed, falling back to the standard library.
+    Datetimes are encoded as ISO 8601 strings and other unsupported types, such as Mongo ObjectIds, as strings.
+
+    Example:
+        >>> app = Flask('CloudHarvestApi')
+        >>> app.json = HarvestJSONProvider(app)
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+
+        # orjson is imported by the first response rather than when the application is created
+        self._orjson = None
+        self._orjson_loaded = False
+
+    @property
+    def orjson(self):
+        """
+        Returns the `orjson` module, or None if it is not installed.
+        """
+        if not self._orjson_loaded:
+            try:
+                import orjson
+                self._orjson = orjson
+
+            except ImportError:
+                logger.warning('orjson is not installed; using the standard library JSON encoder')
+
+            self._orjson_loaded = True
+
+        return self._orjson
+
+    @staticmethod
+    def _default(obj: Any) -> Any:
+        if isinstance(obj, date):
+            return obj.isoformat()
+
+        return str(obj)
+
+    def dumpb(self, obj: Any) -> bytes:
+        orjson = self.orjson
+
+        if orjson:
+            return orjson.dumps(obj, default=self._default, option=orjson.OPT_NON_STR_KEYS)
+
+        return dumps(obj, default=self._default, separators=(',', ':')).encode()
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return self.dumpb(obj).decode()
+
+    def loads(self, s: str or bytes, **kwargs) -> Any:
+        if self.orjson:
+            return self.orjson.loads(s)
+
+        return loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+
+        return self._app.response_class(self.dumpb(obj), mimetype='application/json')
+
+
+class CircuitBreakerOpen(Exception):
+    """
+    Raised when a request is refused because the circuit breaker of its silo is open.
+    """
+    pass
+
+
+class CircuitBreaker:
+    """
+    A per-silo circuit breaker. After `failure_threshold` consecutive connection failures the breaker opens and requests
+    fail immediately for `reset_seconds`. A single trial request is then allowed through; the breaker closes if it
+    succeeds and opens again if it fails.
+
+    Arguments
+    name (str): The name of the silo protected by the breaker.
+    failure_threshold (int, optional): The number of consecutive failures which opens the breaker. Defaults to 5.
+    reset_seconds (float, optional): The number of seconds the breaker stays open. Defaults to 10.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 10):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self.failures = 0
+        self.opened_at = None
+
+        self._lock = Lock()
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+
+        return 'half-open' if monotonic() - self.opened_at >= self.reset_seconds else 'open'
+
+    def allow(self):
+        """
+        Raises CircuitBreakerOpen if a request may not be made to the silo.
+        """
+
+        with self._lock:
+            match self.state:
+                case 'closed':
+                    return
+
+                case 'half-open' if not self._trial:
+                    # Only one request tests the silo while the breaker is half-open
+                    self._trial = True
+                    return
+
+            raise CircuitBreakerOpen(f'{self.name}: circuit breaker is open after {self.failures} failures')
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f'{self.name}: circuit breaker closed')
+
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def release(self):
+        """
+        Ends a trial request without a verdict, such as when it failed for a reason other than the silo's availability,
+        so that the next request may try again.
+        """
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+            if self._trial or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._trial:
+                    logger.warning(f'{self.name}: circuit breaker opened after {self.failures} failures')
+
+                self.opened_at = monotonic()
+                self._trial = False
+
+
+# Counters used by `log_debug_sampled`, keyed by message
+DEBUG_SAMPLE_COUNTERS = {}
+
+
+def log_debug_sampled(message: str, *args, rate: int = None):
+    """
+    Logs a debug message once every `rate` calls. Use this for messages logged on every call of a hot path, such as
+    each Redis command, so that debug logging under load stays bounded. Arguments are only formatted when the message is
+    logged.
+
+    Arguments
+    message (str): A %-style message, which also identifies the counter.
+    args: The message arguments.
+    rate (int, optional): Log one call in this many. Defaults to `api.logging.debug_sample_rate` or 100.
+    """
+    if not logger.isEnabledFor(DEBUG):
+        return
+
+    if rate is None:
+        rate = int(((Environment.get('api') or {}).get('logging') or {}).get('debug_sample_rate') or 100)
+
+    counter = DEBUG_SAMPLE_COUNTERS.get(message)
+
+    if counter is None:
+        counter = DEBUG_SAMPLE_COUNTERS.setdefault(message, count())
+
+    calls = next(counter)
+
+    if calls % rate == 0:
+        logger.debug(message + ' (%s calls, sampled 1/%s)', *args, calls + 1, rate)
+
+
+# Per-process clients and circuit breakers, keyed by silo name. Clients are created once per process because
+# connection pools cannot be shared across a fork.
+REDIS_CLIENTS = {}
+CIRCUIT_BREAKERS = {}
+
+
+def get_redis_config() -> dict:
+    """
+    Returns the `api.redis` configuration.
+    """
+
+    return (Environment.get('api') or {}).get('redis') or {}
+
+
+def get_circuit_breaker(silo_name: str) -> CircuitBreaker:
+    if silo_name not in CIRCUIT_BREAKERS:
+        config = get_redis_config()
+
+        CIRCUIT_BREAKERS.setdefault(silo_name, CircuitBreaker(name=silo_name,
+                                                              failure_threshold=config.get('circuit_failure_threshold') or 5,
+                                                              reset_seconds=config.get('circuit_reset_seconds') or 10))
+
+    return CIRCUIT_BREAKERS[silo_name]
+
+
 class RedisRequest:
-    def __init__(self, silo: str or BaseSilo, max_attempts: int = 10):
+    """
+    Makes requests to a Redis silo using a connection pool shared by the process. Requests which fail to connect are
+    retried with exponential backoff and jitter, and fail immediately while the silo's circuit breaker is open.
+
+    Any StrictRedis method may be called on a RedisRequest. Use `pipeline()` to batch several commands into one round
+    trip.
+
+    Arguments
+    silo (str or BaseSilo): The silo, or the name of the silo, to query.
+    max_attempts (int, optional): The maximum number of attempts per request. Defaults to `api.redis.max_attempts` or 5.
+
+    Example:
+        >>> redis_request = RedisRequest('harvest-tasks')
+        >>> redis_request.hget(name='task::1234', key='status')
+        'complete'
+        >>> pipeline = redis_request.pipeline(transaction=True)
+        >>> pipeline.hset(name='task::1234', key='status', value='enqueued')
+        >>> pipeline.expire(name='task::1234', time=3600)
+        >>> pipeline.execute()
+        [0, True]
+    """
+
+    def __init__(self, silo: str or BaseSilo, max_attempts: int = None):
+        config = get_redis_config()
 
         self.silo = silo
-        self.max_attempts = max_attempts
+        self.max_attempts = max_attempts or config.get('max_attempts') or 5
+        self.backoff_seconds = config.get('backoff_seconds') or 0.1
+        self.max_backoff_seconds = config.get('max_backoff_seconds') or 2
 
         self.client = None
 
@@ -56,14 +469,9 @@ class RedisRequest:
 
     def __exit__(self, exc_type, exc_value, traceback):
         """
-        Context manager to exit the RedisRequest.
+        Context manager to exit the RedisRequest. The client belongs to the process' connection pool, so it is not
+        closed here.
         """
-        # No specific cleanup needed for RedisRequest
-        if self.client:
-            try:
-                self.client.close()
-            except Exception as e:
-                pass
         pass
 
     def __getattr__(self, name):
@@ -72,55 +480,391 @@ class RedisRequest:
         """
 
         def wrapper(*args, **kwargs):
-            from CloudHarvestCoreTasks.silos import get_silo
-            self.silo = get_silo(self.silo) if isinstance(self.silo, str) else self.silo
+            return self.execute(lambda client: getattr(client, name)(*args, **kwargs), name)
+
+        return wrapper
+
+    def connect(self):
+        """
+        Returns the process' client for the silo, connecting on first use.
+        """
+
+        self.silo = get_silo(self.silo) if isinstance(self.silo, str) else self.silo
+
+        key = (getpid(), self.silo.name)
+        client = REDIS_CLIENTS.get(key)
+
+        if client is None:
+            client = REDIS_CLIENTS[key] = self.silo.connect()
+
+        self.client = client
+
+        return client
 
-            for i in range(self.max_attempts):
-                try:
-                    self.client = self.silo.connect()
+    def execute(self, operation, name: str, can_retry=None):
+        """
+        Runs an operation against the silo's client, retrying connection failures with exponential backoff and jitter.
+
+        Arguments
+        operation (Callable[[StrictRedis], Any]): The operation to run.
+        name (str): The name of the operation, used for logging.
+        can_retry (Callable[[], bool], optional): Called after a connection failure; the operation is only retried when
+            it returns True. Use this for operations which may not be applied twice. By default, every connection
+            failure is retried.
+
+        Returns
+        Any: The result of the operation.
+        """
+        from CloudHarvestApi.blueprints.metrics import record_silo_command
+        from redis.exceptions import ConnectionError as RedisConnectionError, RedisError, TimeoutError as RedisTimeoutError
+
+        silo_name = self.silo if isinstance(self.silo, str) else self.silo.name
+        breaker = get_circuit_breaker(silo_name)
+
+        # Pipelines are named `pipeline[n]`; the metric label omits the size
+        command = name.split('[', 1)[0]
+
+        for i in range(self.max_attempts):
+            # Fails fast while the silo is known to be unavailable
+            breaker.allow()
+
+            try:
+                start = perf_counter()
+                client = self.connect()
 
-                    logger.debug(f'{self.silo.name}: {name}')
+                log_debug_sampled('%s: %s', silo_name, name)
 
-                    result = getattr(self.client, name)(*args, **kwargs)
-                    return result
+                result = operation(client)
 
-                except BaseException as ex:
-                    if i < self.max_attempts - 1:
-                        logger.debug(f"Error querying Redis ({i + 1}/{self.max_attempts}): {ex}")
-                        from time import sleep
-                        sleep(1)
-                        continue
+            except (RedisConnectionError, RedisTimeoutError, OSError) as ex:
+                record_silo_command(silo_name, command, perf_counter() - start, error=True)
+                breaker.record_failure()
 
-                    else:
-                        from traceback import format_exc
-                        logger.error(f"Failed to query Redis after {self.max_attempts} attempts: {ex}\n{format_exc()}")
-                        raise
+                # The pool may hold broken connections; the next attempt starts with a new client
+                REDIS_CLIENTS.pop((getpid(), silo_name), None)
+
+                if can_retry is not None and not can_retry():
+                    logger.error(f'Failed to query Redis, not retrying `{name}` as it may have been applied: {ex}')
+                    raise
+
+                if i < self.max_attempts - 1:
+                    delay = uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** i))
+                    logger.debug('Error querying Redis (%s/%s), retrying in %.2fs: %s', i + 1, self.max_attempts, delay, ex)
+                    sleep(delay)
+                    continue
+
+                else:
+                    logger.error(f"Failed to query Redis after {self.max_attempts} attempts: {ex}\n{format_exc()}")
+                    raise
+
+            except RedisError:
+                # The silo answered, such as with a WRONGTYPE error, so it is available
+                record_silo_command(silo_name, command, perf_counter() - start, error=True)
+                breaker.record_success()
+                raise
+
+            except Exception:
+                # The operation failed for a reason unrelated to the silo's availability
+                breaker.release()
+                raise
+
+            else:
+                record_silo_command(silo_name, command, perf_counter() - start)
+                breaker.record_success()
+                return result
+
+    def pipeline(self, transaction: bool = True) -> 'RedisPipeline':
+        """
+        Returns a pipeline which sends every queued command to the silo in a single round trip.
+
+        Arguments
+        transaction (bool, optional): Wrap the commands in MULTI/EXEC so they are applied atomically. Defaults to True.
+        """
+        return RedisPipeline(self, transaction=transaction)
+
+
+class RedisPipeline:
+    """
+    Queues StrictRedis commands locally and sends them in one round trip when `execute()` is called. The commands are
+    recorded so that the whole pipeline can be replayed if the connection fails. Transactions are only replayed if the
+    connection failed before they were sent, since a transaction whose reply was lost may already have been applied.
+    """
+
+    def __init__(self, redis_request: RedisRequest, transaction: bool = True):
+        self.redis_request = redis_request
+        self.transaction = transaction
+
+        self.commands = []
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def __getattr__(self, name):
+        def wrapper(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+
+            return self
 
         return wrapper
 
+    def execute(self) -> list:
+        """
+        Sends the queued commands and returns their results in order.
+        """
+
+        if not self.commands:
+            return []
+
+        sent = False
+
+        def operation(client):
+            nonlocal sent
+
+            pipeline = client.pipeline(transaction=self.transaction)
+
+            for name, args, kwargs in self.commands:
+                getattr(pipeline, name)(*args, **kwargs)
+
+            if self.transaction:
+                # Connecting first separates failures before the transaction is sent from those after it
+                pipeline.connection = client.connection_pool.get_connection()
+                sent = True
+
+            return pipeline.execute()
+
+        try:
+            return self.redis_request.execute(operation, f'pipeline[{len(self.commands)}]', can_retry=lambda: not sent)
+
+        finally:
+            self.commands = []
+
+
+class ResponseCache:
+    """
+    A keyed, in-process cache of endpoint responses with a time-to-live and least-recently-used eviction.
+
+    Concurrent misses for the same key are single-flighted: the first caller runs the backing query while the others
+    wait for, and share, its response.
+
+    Arguments
+    name (str): The name of the cache, typically the endpoint function name.
+    valid_age (int, optional): The number of seconds a response remains valid. Defaults to 60.
+    max_entries (int, optional): The maximum number of responses kept before the least recently used is evicted.
+        Defaults to 128.
+    """
+
+    def __init__(self, name: str, valid_age: int = 60, max_entries: int = 128):
+        self.name = name
+        self.valid_age = valid_age
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()       # key -> (expires, data, mimetype, success)
+        self._inflight = {}                 # key -> [Event, (data, mimetype, success)]
+        self._lock = Lock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key: tuple, func) -> Response:
+        """
+        Returns the cached response for a key, calling `func` to create it if it is missing or expired. Only
+        successful responses are stored.
+
+        Arguments
+        key (tuple): The cache key.
+        func (Callable[[], Response]): Creates the response on a miss.
+
+        Returns
+        Response: A new Response object built from the cached body.
+        """
+        from CloudHarvestApi.blueprints.metrics import metrics_registry
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+
+                if entry and entry[0] > monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics_registry.inc('harvest_cache_requests_total', (('cache', self.name), ('result', 'hit')))
+
+                    return cached_response(entry[1], entry[2], True)
+
+                flight = self._inflight.get(key)
+
+                if flight is None:
+                    flight = self._inflight[key] = [Event(), None]
+                    self.misses += 1
+                    metrics_registry.inc('harvest_cache_requests_total', (('cache', self.name), ('result', 'miss')))
+                    break
+
+            # Another request is already running the backing query for this key
+            flight[0].wait()
+
+            if flight[1] is False:
+                return func()
+
+            if flight[1] is not None:
+                with self._lock:
+                    self.hits += 1
+                    metrics_registry.inc('harvest_cache_requests_total', (('cache', self.name), ('result', 'hit')))
+
+                return cached_response(*flight[1])
+
+        try:
+            response = func()
+
+            # Streamed responses are too large to hold in memory, so they are neither cached nor shared
+            if response.is_streamed:
+                flight[1] = False
+                return response
+
+            success = is_successful(response)
+            body = (response.get_data(), response.mimetype, success)
+
+            if success:
+                with self._lock:
+                    self._entries[key] = (monotonic() + self.valid_age, *body)
+                    self._entries.move_to_end(key)
+
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+
+            flight[1] = body
+
+            return response
+
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+            flight[0].set()
+
+
+def cached_response(data: bytes, mimetype: str, success: bool) -> Response:
+    """
+    Returns a new response with a cached body, carrying the outcome of the response it was copied from.
+    """
+
+    response = Response(data, mimetype=mimetype)
+    response.harvest_success = success
+
+    return response
+
+
+# All response caches created by `use_cache`, keyed by name
+RESPONSE_CACHES = {}
+
+
+def get_response_cache(name: str) -> ResponseCache:
+    """
+    Returns the response cache for an endpoint, creating it from the `api.cache` configuration on first use. The
+    `api.cache.default` values apply to any endpoint without its own entry.
+    """
+
+    if name not in RESPONSE_CACHES:
+
+        cache_config = (Environment.get('api') or {}).get('cache') or {}
+        config = (cache_config.get('default') or {}) | (cache_config.get(name) or {})
+
+        RESPONSE_CACHES.setdefault(name, ResponseCache(name=name,
+                                                       valid_age=config.get('valid_age', 60),
+                                                       max_entries=config.get('max_entries', 128)))
+
+    return RESPONSE_CACHES[name]
+
+
+def content_version(*parts: Any) -> str:
+    """
+    Returns a short hash of `parts` for use as a version of the data behind a response. Dictionaries are hashed with
+    sorted keys, so equal data always has the same version.
+    """
+
+    return sha256(dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
 
 ########################################################################################################################
 # DECORATORS
 ########################################################################################################################
-def use_cache_if_valid(cached_data: CachedData):
+def use_etag(version):
     """
-    A decorator to use cached data if it is still valid.
-    :param cached_data: The CachedData object to use.
-    :return: The cached data if it is still valid.
+    A decorator which adds a strong ETag to the responses of a GET endpoint and answers a matching `If-None-Match` with
+    304 Not Modified. The ETag is derived from `version` alone, so a 304 is returned without calling the endpoint or
+    serializing its result. Place this decorator between `@route` and `@use_cache`.
+
+    Arguments
+    version (Callable[[], str]): Returns the version of the data behind the endpoint, such as a content hash, and
+        changes whenever the response would change.
+
+    Returns
+    The decorated function.
     """
 
     def decorator(func):
+        @wraps(func)
         def wrapper(*args, **kwargs):
-            if cached_data.is_valid:
-                return safe_jsonify(
-                    success=True,
-                    reason='OK',
-                    result=cached_data.data
-                )
+            if not has_request_context() or request.method not in ('GET', 'HEAD'):
+                return func(*args, **kwargs)
 
-            else:
+            try:
+                etag = content_version(func.__name__, version(), args, kwargs)
+
+            except Exception as ex:
+                logger.debug('%s: could not determine the response version: %s', func.__name__, ex)
                 return func(*args, **kwargs)
 
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+
+                return response
+
+            response = func(*args, **kwargs)
+
+            # Failed responses are not tagged, so they are never revalidated in place of the data
+            if not response.is_streamed and is_successful(response):
+                response.set_etag(etag)
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def use_cache(name: str = None, body_keys: tuple = ()):
+    """
+    A decorator which caches the responses of an endpoint. Responses are keyed by the endpoint's arguments and the
+    values of `body_keys` in the request JSON. This decorator must be placed below `@route` so that both HTTP requests
+    and internal calls are served from the cache.
+
+    :param name: The name of the cache in the `api.cache` configuration. Defaults to the function name.
+    :param body_keys: The request JSON keys which change the response.
+    :return: The decorated function.
+    """
+
+    def decorator(func):
+        cache_name = name or func.__name__
+        func_signature = signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            body = (safe_request_get_json(request) or {}) if has_request_context() and body_keys else {}
+
+            # Positional and keyword calls with the same arguments share a key
+            arguments = func_signature.bind(*args, **kwargs).arguments
+
+            key = (
+                tuple((argument, str(value)) for argument, value in arguments.items()),
+                tuple(str(body.get(body_key)) for body_key in body_keys)
+            )
+
+            return get_response_cache(cache_name).get(key, lambda: func(*args, **kwargs))
+
         return wrapper
 
     return decorator
@@ -0,0 +1,188 @@
+"""
+Negotiated response compression. Responses of at least `api.compression.threshold` bytes are compressed with the
+encoding from `api.compression.encodings` which the client prefers in its `Accept-Encoding` header, with the order of
+`api.compression.encodings` breaking ties between equally preferred encodings. Streamed responses, such as large task
+results, are compressed one chunk at a time as they are sent, so they are never held in memory.
+
+`zstd` requires the `zstandard` package; when it is not installed, only `gzip` is offered.
+"""
+from CloudHarvestCoreTasks.blueprints import HarvestApiBlueprint
+from CloudHarvestCoreTasks.environment import Environment
+from flask import Response, request
+from importlib.util import find_spec
+from logging import getLogger
+from zlib import DEFLATED, MAX_WBITS, compressobj
+
+logger = getLogger('harvest')
+
+compression_blueprint = HarvestApiBlueprint(
+    'compression_bp', __name__
+)
+
+# Only these types of content are compressed; anything else, such as images, is usually compressed already
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/')
+
+
+class GzipCompressor:
+    """
+    Compresses a stream of bytes in the gzip format.
+    """
+
+    def __init__(self, level: int = 6):
+        # Adding 16 to the window bits writes a gzip header and trailer instead of a zlib one
+        self._compressor = compressobj(level, DEFLATED, MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+class ZstdCompressor:
+    """
+    Compresses a stream of bytes in the zstd format. Requires the `zstandard` package.
+    """
+
+    def __init__(self, level: int = 3):
+        import zstandard
+
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+def get_available_encodings(encodings: list) -> list:
+    """
+    Returns the encodings from `encodings` which this node supports, in the same order.
+    """
+    available = []
+
+    for encoding in encodings:
+        if encoding == 'zstd':
+            if find_spec('zstandard') is None:
+                logger.warning('zstandard is not installed; zstd compression is disabled')
+                continue
+
+        elif encoding != 'gzip':
+            logger.warning(f'Unsupported compression encoding `{encoding}` ignored')
+            continue
+
+        available.append(encoding)
+
+    return available
+
+
+def negotiate_encoding(encodings: list) -> str or None:
+    """
+    Returns the encoding from `encodings` with the highest quality in the client's `Accept-Encoding` header, preferring
+    the earlier encoding in `encodings` when qualities are equal, or None when the client accepts none of them.
+    """
+    accepted = request.accept_encodings
+
+    qualities = [(accepted[encoding], -index, encoding) for index, encoding in enumerate(encodings)]
+
+    # A quality of 0 explicitly refuses an encoding
+    quality, _, encoding = max(qualities, default=(0, 0, None))
+
+    return encoding if quality > 0 else None
+
+
+@compression_blueprint.record_once
+def install_compression_hook(state):
+    """
+    Installs the compression hook on the application, unless no supported encodings are configured.
+    """
+    config = (Environment.get('api') or {}).get('compression') or {}
+
+    encodings = get_available_encodings(config.get('encodings', ['zstd', 'gzip']) or [])
+    threshold = int(config.get('threshold', 1024))
+    levels = {
+        'gzip': int(config.get('gzip_level', 6)),
+        'zstd': int(config.get('zstd_level', 3)),
+    }
+
+    if not encodings:
+        return
+
+    compressors = {
+        'gzip': GzipCompressor,
+        'zstd': ZstdCompressor,
+    }
+
+    @state.app.after_request
+    def compress_response(response: Response) -> Response:
+        # A 304 carries the Vary header and the ETag of the response it revalidates, which is weak when it is compressed
+        if response.status_code == 304:
+            response.vary.add('Accept-Encoding')
+
+            etag, weak = response.get_etag()
+            if etag and not weak and negotiate_encoding(encodings) is not None:
+                response.set_etag(etag, weak=True)
+
+            return response
+
+        if response.status_code < 200 or response.status_code in (204, 206) \
+                or response.direct_passthrough \
+                or 'Content-Encoding' in response.headers \
+                or not (response.mimetype or '').startswith(COMPRESSIBLE_MIMETYPES):
+            return response
+
+        # The response depends on Accept-Encoding whether or not this particular response is compressed
+        response.vary.add('Accept-Encoding')
+
+        # Streamed responses are large by construction, so only buffered responses are measured
+        if not response.is_streamed and (response.content_length or 0) < threshold:
+            return response
+
+        encoding = negotiate_encoding(encodings)
+
+        if encoding is None:
+            return response
+
+        compressor = compressors[encoding](levels[encoding])
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, compressor)
+            response.headers.pop('Content-Length', None)
+
+        else:
+            response.set_data(compressor.compress(response.get_data()) + compressor.flush())
+
+        response.headers['Content-Encoding'] = encoding
+
+        # The compressed body is a different representation, so a strong ETag no longer identifies it byte for byte
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+        return response
+
+    logger.info(f'Response compression enabled ({", ".join(encodings)}, threshold: {threshold} bytes)')
+
+
+def compress_stream(chunks, compressor):
+    """
+    Yields the compressed form of a stream of chunks, closing the original stream when done.
+    """
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+
+            data = compressor.compress(chunk)
+
+            if data:
+                yield data
+
+        yield compressor.flush()
+
+    finally:
+        close = getattr(chunks, 'close', None)
+
+        if close is not None:
+            close()
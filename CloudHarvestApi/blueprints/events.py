@@ -0,0 +1,191 @@
+"""
+Keyspace events for the Redis silos. Rather than polling keys while a client waits on them, a single listener per silo
+and process subscribes to Redis keyspace notifications and wakes only the waiters whose keys changed. Callbacks may also
+be registered to react to every event, such as invalidating an in-process cache.
+"""
+from contextlib import contextmanager
+from logging import getLogger
+from os import getpid
+from threading import Event, Lock, Thread
+
+logger = getLogger('harvest')
+
+
+class KeyspaceEventListener:
+    """
+    Listens for keyspace notifications on a silo and fans them out to any threads waiting on those keys.
+
+    The listener thread is started lazily the first time a key is watched and is restarted if the process has been
+    forked since it was started (as happens with gunicorn workers).
+    """
+
+    def __init__(self, silo: str, key_pattern: str, reconnect_seconds: int = 5):
+        self.silo = silo
+        self.key_pattern = key_pattern
+        self.reconnect_seconds = reconnect_seconds
+
+        self._callbacks = []
+        self._lock = Lock()
+        self._pid = None
+        self._thread = None
+        self._waiters = {}
+
+        # True when the listener is subscribed and the server is publishing notifications for hashes
+        self.is_active = False
+
+    def add_callback(self, callback):
+        """
+        Registers a callback which is invoked with the key and the event name (`hset`, `del`, `expired`, ...) of every
+        notification received by the listener. Callbacks run on the listener thread and must not block.
+
+        Arguments
+        callback (Callable[[str, str], None]): The callback to invoke.
+        """
+
+        with self._lock:
+            if callback not in self._callbacks:
+                self._callbacks.append(callback)
+
+        self.start()
+
+    @contextmanager
+    def watch(self, redis_names: list):
+        """
+        Registers an Event which is set whenever one of the provided keys is written, deleted, or expires.
+
+        Arguments
+        redis_names (list): The Redis names of the keys to watch.
+
+        Yields
+        Event: The Event which is set when a key changes.
+        """
+
+        self.start()
+
+        event = Event()
+
+        with self._lock:
+            for redis_name in redis_names:
+                self._waiters.setdefault(redis_name, set()).add(event)
+
+        try:
+            yield event
+
+        finally:
+            with self._lock:
+                for redis_name in redis_names:
+                    waiters = self._waiters.get(redis_name)
+
+                    if waiters:
+                        waiters.discard(event)
+
+                        if not waiters:
+                            self._waiters.pop(redis_name, None)
+
+    def start(self):
+        """
+        Starts the listener thread if it is not already running in this process.
+        """
+
+        with self._lock:
+            if self._pid == getpid() and self._thread and self._thread.is_alive():
+                return
+
+            self._pid = getpid()
+            self.is_active = False
+            self._thread = Thread(target=self._listen, name=f'{self.silo}-events', daemon=True)
+            self._thread.start()
+
+    def _notify(self, redis_name: str = None, event_name: str = None):
+        """
+        Sets the Event of every waiter on a key. When no key is provided, all waiters are woken so they can re-check
+        their keys, such as after a reconnect where notifications may have been missed.
+        """
+        with self._lock:
+            if redis_name is None:
+                events = set().union(*self._waiters.values()) if self._waiters else set()
+
+            else:
+                events = set(self._waiters.get(redis_name) or ())
+
+            callbacks = list(self._callbacks)
+
+        for event in events:
+            event.set()
+
+        for callback in callbacks:
+            try:
+                callback(redis_name, event_name)
+
+            except Exception as ex:
+                logger.warning(f'{self.silo}: keyspace event callback failed: {ex}')
+
+    def _listen(self):
+        from CloudHarvestCoreTasks.silos import get_silo
+        from time import sleep
+
+        while True:
+            try:
+                silo = get_silo(self.silo)
+                client = silo.connect()
+
+                self._enable_notifications(client)
+
+                channel_prefix = f'__keyspace@{silo.database}__:'
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(channel_prefix + self.key_pattern)
+
+                logger.info(f'{self.silo}: listening for keyspace events on `{self.key_pattern}`')
+
+                # Anything which changed while we were disconnected has not been signalled
+                self._notify()
+
+                for message in pubsub.listen():
+                    channel, event_name = message.get('channel'), message.get('data')
+
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+
+                    if isinstance(event_name, bytes):
+                        event_name = event_name.decode()
+
+                    self._notify(channel[len(channel_prefix):], event_name)
+
+            except Exception as ex:
+                logger.warning(f'{self.silo}: keyspace event listener disconnected: {ex}')
+
+            self.is_active = False
+
+            # Waiters fall back to polling and callbacks to their own expiry while the listener is down
+            self._notify()
+            sleep(self.reconnect_seconds)
+
+    def _enable_notifications(self, client):
+        """
+        Ensures the server publishes keyspace notifications for hash, generic, and expiration events. Managed Redis
+        services may refuse CONFIG SET, in which case the existing server configuration is used.
+        """
+
+        try:
+            flags = client.config_get('notify-keyspace-events').get('notify-keyspace-events') or ''
+
+        except Exception as ex:
+            logger.warning(f'{self.silo}: could not read keyspace notification settings, waiters will poll: {ex}')
+            return
+
+        if 'K' in flags and ('A' in flags or all(flag in flags for flag in 'hgx')):
+            self.is_active = True
+            return
+
+        try:
+            client.config_set('notify-keyspace-events', ''.join(sorted(set(flags + 'Khgx'))))
+            self.is_active = True
+
+        except Exception as ex:
+            logger.warning(f'{self.silo}: keyspace notifications are disabled and could not be enabled, waiters will '
+                           f'poll: {ex}')
+
+
+# One listener per silo and process; waiters are multiplexed over a single subscription
+agent_event_listener = KeyspaceEventListener(silo='harvest-nodes', key_pattern='agent*')
+task_event_listener = KeyspaceEventListener(silo='harvest-tasks', key_pattern='task:*')
@@ -0,0 +1,125 @@
+"""
+The PSTAR expansion engine. A PSTAR (Platform, Service, Type, Account, Region) filter is expanded into every matching
+combination of the templates, accounts, and regions known to the agents. Each dimension is filtered before the cross
+product is taken, and the product is generated lazily so it can be counted or streamed without being materialized.
+"""
+from logging import getLogger
+from re import compile as compile_pattern
+from typing import Callable, Iterator
+
+logger = getLogger('harvest')
+
+PSTAR_FIELDS = ('platform', 'service', 'type', 'account', 'region')
+
+
+class PStarExpansion:
+    """
+    Expands a PSTAR filter against the available services, accounts, and regions.
+
+    Arguments
+    pstar (dict): A PSTAR as returned by `format_pstar()`. Each value is a regular expression.
+    services (list): The available service templates, formatted as `platform.service.type`.
+    accounts (dict): The available accounts keyed by platform.
+    regions (Callable[[str], list]): Returns the region names of a platform. Only called for platforms which have
+        matching services and accounts.
+
+    Example:
+        >>> expansion = PStarExpansion(format_pstar({'platform': 'aws', 'service': 'rds'}), services, accounts, regions)
+        >>> expansion.count()
+        1200
+        >>> next(expansion.expand())
+        {'platform': 'aws', 'service': 'rds', 'type': 'instances', 'account': '...', 'region': '...', 'template': '...'}
+    """
+
+    def __init__(self, pstar: dict, services: list, accounts: dict, regions: Callable[[str], list]):
+        # Patterns are compiled once per expansion rather than once per comparison
+        self.patterns = {
+            field: compile_pattern(pstar.get(field) or '.*')
+            for field in PSTAR_FIELDS
+        }
+
+        self.services = services
+        self.accounts = accounts
+        self.regions = regions
+
+        self._dimensions = None
+
+    def matches(self, field: str, value: str) -> bool:
+        """
+        Returns True if the value matches the PSTAR pattern for the field.
+        """
+        return value is not None and self.patterns[field].search(value) is not None
+
+    def dimensions(self) -> list:
+        """
+        Filters each dimension of the expansion independently. Platforms without matching services or accounts are
+        pruned before their regions are retrieved.
+
+        Returns
+        list: A list of (platform, accounts, regions, services) tuples where `services` is a list of
+        (service, type, template) tuples.
+        """
+
+        if self._dimensions is not None:
+            return self._dimensions
+
+        services_by_platform = {}
+        for template in self.services:
+            try:
+                service_platform, service_name, service_type = template.split('.', 2)
+
+            except ValueError:
+                logger.debug(f'Skipping malformed service template `{template}`')
+                continue
+
+            if self.matches('service', service_name) and self.matches('type', service_type):
+                services_by_platform.setdefault(service_platform, []).append((service_name, service_type, template))
+
+        dimensions = []
+        for platform in sorted(self.accounts.keys()):
+            if not self.matches('platform', platform):
+                continue
+
+            services = services_by_platform.get(platform)
+            if not services:
+                continue
+
+            accounts = [account for account in self.accounts[platform] if self.matches('account', account)]
+            if not accounts:
+                continue
+
+            regions = [region for region in self.regions(platform) or [] if self.matches('region', region)]
+            if not regions:
+                continue
+
+            dimensions.append((platform, accounts, regions, services))
+
+        self._dimensions = dimensions
+
+        return dimensions
+
+    def count(self) -> int:
+        """
+        Returns the number of combinations in the expansion without generating them.
+        """
+        return sum(
+            len(accounts) * len(regions) * len(services)
+            for platform, accounts, regions, services in self.dimensions()
+        )
+
+    def expand(self) -> Iterator[dict]:
+        """
+        Lazily yields every combination in the expansion.
+        """
+        for platform, accounts, regions, services in self.dimensions():
+            for account in accounts:
+                for region in regions:
+                    for service_name, service_type, template in services:
+                        yield {
+                            'platform': platform,
+                            'service': service_name,
+                            'type': service_type,
+                            'account': account,
+                            'region': region,
+                            'template': template
+                        }
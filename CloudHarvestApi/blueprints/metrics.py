@@ -0,0 +1,439 @@
+"""
+Prometheus metrics for the api node. Each process records its own metrics in memory and periodically writes them to
+`{node directory}/metrics/{pid}.json`. The `/metrics` endpoint merges the files of every worker on the node, so any
+worker can answer a scrape for the whole node.
+"""
+from CloudHarvestCoreTasks.blueprints import HarvestApiBlueprint
+from CloudHarvestCoreTasks.environment import Environment
+from flask import Response, g, request
+from logging import getLogger
+from os import getpid, register_at_fork
+from threading import Lock, Thread
+from time import perf_counter
+
+logger = getLogger('harvest')
+
+metrics_blueprint = HarvestApiBlueprint(
+    'metrics_bp', __name__
+)
+
+# Histogram buckets, in seconds
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SILO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+# The type, help text, and buckets of every metric
+METRICS = {
+    'harvest_http_requests_total': ('counter', 'Requests served, by route, method, and status.', None),
+    'harvest_http_request_duration_seconds': ('histogram', 'Time spent handling requests, by route and method.', REQUEST_BUCKETS),
+    'harvest_http_requests_in_flight': ('gauge', 'Requests currently being handled.', None),
+    'harvest_silo_commands_total': ('counter', 'Commands sent to silos, by silo and command.', None),
+    'harvest_silo_command_errors_total': ('counter', 'Silo commands which raised an error, by silo and command.', None),
+    'harvest_silo_command_duration_seconds': ('histogram', 'Round trip time of silo commands, by silo.', SILO_BUCKETS),
+    'harvest_cache_requests_total': ('counter', 'Response cache lookups, by cache and result.', None),
+    'harvest_task_queue_depth': ('gauge', 'Tasks waiting in each priority queue.', None),
+}
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics of one process and merges them with those of the other workers on the node.
+
+    Arguments
+    flush_seconds (float, optional): How often the process writes its metrics for the other workers. Defaults to
+        `api.metrics.flush_seconds` or 5, read when the flush thread starts, after the configuration has been loaded.
+    """
+
+    def __init__(self, flush_seconds: float = None):
+        self.flush_seconds = flush_seconds
+
+        self._reset()
+
+        # A forked worker starts with empty metrics rather than a copy of its parent's
+        register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._pid = None
+
+    def inc(self, name: str, labels: tuple = (), value: float = 1):
+        """
+        Adds `value` to a counter or gauge. `labels` is a tuple of (label, value) pairs.
+        """
+        values = self._gauges if METRICS[name][0] == 'gauge' else self._counters
+
+        with self._lock:
+            values[(name, labels)] = values.get((name, labels), 0) + value
+
+        self._start()
+
+    def observe(self, name: str, labels: tuple, value: float):
+        """
+        Records `value` in a histogram.
+        """
+        buckets = METRICS[name][2]
+
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+
+            if histogram is None:
+                # One count per bucket, then the sum and the count of all observations
+                histogram = self._histograms[(name, labels)] = [0] * len(buckets) + [0, 0]
+
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[i] += 1
+
+            histogram[-2] += value
+            histogram[-1] += 1
+
+        self._start()
+
+    def snapshot(self) -> dict:
+        """
+        Returns this process' metrics in the form written to its metrics file.
+        """
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self._counters.items()]
+            gauges = [[name, list(labels), value] for (name, labels), value in self._gauges.items()]
+            histograms = [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()]
+
+        return {
+            'pid': getpid(),
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': histograms
+        }
+
+    def flush(self):
+        """
+        Writes this process' metrics file.
+        """
+        from json import dumps
+        from os import replace
+        from os.path import join
+
+        filename = join(get_metrics_directory(), f'{getpid()}.json')
+
+        with open(f'{filename}.tmp', 'w') as metrics_file:
+            metrics_file.write(dumps(self.snapshot()))
+
+        replace(f'{filename}.tmp', filename)
+
+    def collect(self) -> list:
+        """
+        Returns the snapshots of every worker on the node. The counters and histograms of workers which have exited are
+        folded into `archive.json` so that totals never decrease; their gauges are discarded.
+        """
+        from fcntl import flock, LOCK_EX, LOCK_UN
+        from json import dumps, loads
+        from os import kill, listdir, remove, replace
+        from os.path import exists, join
+
+        self.flush()
+
+        directory = get_metrics_directory()
+        archive_path = join(directory, 'archive.json')
+
+        with open(join(directory, 'metrics.lock'), 'a') as lock_file:
+            flock(lock_file, LOCK_EX)
+
+            try:
+                snapshots = []
+                exited = []
+
+                for filename in listdir(directory):
+                    if not filename.endswith('.json') or filename == 'archive.json':
+                        continue
+
+                    try:
+                        with open(join(directory, filename)) as metrics_file:
+                            snapshot = loads(metrics_file.read())
+
+                    except (OSError, ValueError):
+                        continue
+
+                    try:
+                        kill(snapshot['pid'], 0)
+                        snapshots.append(snapshot)
+
+                    except ProcessLookupError:
+                        exited.append((filename, snapshot))
+
+                    except PermissionError:
+                        # The process exists but belongs to another user
+                        snapshots.append(snapshot)
+
+                archive = {'pid': None, 'counters': [], 'gauges': [], 'histograms': []}
+
+                if exists(archive_path):
+                    with open(archive_path) as archive_file:
+                        archive = loads(archive_file.read())
+
+                if exited:
+                    for filename, snapshot in exited:
+                        snapshot['gauges'] = []
+                        archive = merge_snapshots([archive, snapshot])
+
+                    with open(f'{archive_path}.tmp', 'w') as archive_file:
+                        archive_file.write(dumps(archive))
+
+                    replace(f'{archive_path}.tmp', archive_path)
+
+                    for filename, snapshot in exited:
+                        remove(join(directory, filename))
+
+                snapshots.append(archive)
+
+                return snapshots
+
+            finally:
+                flock(lock_file, LOCK_UN)
+
+    def _start(self):
+        # Starts the flush thread once per process, including after a fork
+        if self._pid == getpid():
+            return
+
+        with self._lock:
+            if self._pid == getpid():
+                return
+
+            self._pid = getpid()
+
+        Thread(target=self._flush_forever, name='metrics-flush', daemon=True).start()
+
+    def _flush_forever(self):
+        from time import sleep
+
+        if self.flush_seconds is None:
+            self.flush_seconds = ((Environment.get('api') or {}).get('metrics') or {}).get('flush_seconds') or 5
+
+        while True:
+            sleep(self.flush_seconds)
+
+            try:
+                self.flush()
+
+            except Exception as ex:
+                logger.debug('Failed to write metrics: %s', ex)
+
+
+def get_metrics_directory() -> str:
+    """
+    Returns the directory shared by the node's workers for their metrics files, creating it if needed. It is kept in
+    the node's heartbeat directory, which is keyed by port so that several nodes may run on one host.
+    """
+    from os import makedirs
+    from os.path import join
+    from tempfile import gettempdir
+
+    api = Environment.get('api') or {}
+    port = (api.get('connection') or {}).get('port')
+
+    directory = join((api.get('heartbeat') or {}).get('directory') or join(gettempdir(), f'cloudharvestapi-{port}'),
+                     'metrics')
+
+    makedirs(directory, exist_ok=True)
+
+    return directory
+
+
+def merge_snapshots(snapshots: list) -> dict:
+    """
+    Sums the counters, gauges, and histograms of several snapshots.
+    """
+    merged = {'pid': None, 'counters': {}, 'gauges': {}, 'histograms': {}}
+
+    for snapshot in snapshots:
+        for kind in ('counters', 'gauges'):
+            for name, labels, value in snapshot.get(kind) or []:
+                key = (name, tuple(tuple(label) for label in labels))
+                merged[kind][key] = merged[kind].get(key, 0) + value
+
+        for name, labels, values in snapshot.get('histograms') or []:
+            key = (name, tuple(tuple(label) for label in labels))
+            existing = merged['histograms'].get(key)
+            merged['histograms'][key] = [a + b for a, b in zip(existing, values)] if existing else list(values)
+
+    return {
+        'pid': None,
+        'counters': [[name, [list(label) for label in labels], value] for (name, labels), value in merged['counters'].items()],
+        'gauges': [[name, [list(label) for label in labels], value] for (name, labels), value in merged['gauges'].items()],
+        'histograms': [[name, [list(label) for label in labels], values] for (name, labels), values in merged['histograms'].items()]
+    }
+
+
+def render_metrics(snapshot: dict) -> str:
+    """
+    Formats a snapshot in the Prometheus text exposition format.
+    """
+    def format_labels(labels) -> str:
+        if not labels:
+            return ''
+
+        escaped = (
+            (label, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for label, value in labels
+        )
+
+        return '{' + ','.join(f'{label}="{value}"' for label, value in escaped) + '}'
+
+    samples = {}
+
+    for kind in ('counters', 'gauges'):
+        for name, labels, value in snapshot[kind]:
+            samples.setdefault(name, []).append(f'{name}{format_labels(labels)} {value}')
+
+    for name, labels, values in snapshot['histograms']:
+        buckets = METRICS[name][2]
+        lines = samples.setdefault(name, [])
+
+        for bound, bucket_count in zip(buckets, values):
+            lines.append(f'{name}_bucket{format_labels(list(labels) + [["le", bound]])} {bucket_count}')
+
+        lines.append(f'{name}_bucket{format_labels(list(labels) + [["le", "+Inf"]])} {values[-1]}')
+        lines.append(f'{name}_sum{format_labels(labels)} {values[-2]}')
+        lines.append(f'{name}_count{format_labels(labels)} {values[-1]}')
+
+    output = []
+
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        if name in samples:
+            output.append(f'# HELP {name} {help_text}')
+            output.append(f'# TYPE {name} {metric_type}')
+            output.extend(sorted(samples[name]))
+
+    return '\n'.join(output) + '\n'
+
+
+def get_queue_depths() -> list:
+    """
+    Returns the number of tasks in each `queue::{priority}` list as gauge samples.
+    """
+    from CloudHarvestApi.blueprints.base import RedisRequest
+
+    redis_request = RedisRequest(silo='harvest-tasks')
+
+    # Each SCAN call goes through RedisRequest, so it is retried and measured like any other command; `scan_iter` would
+    # run its calls outside of it
+    queues = []
+    cursor = 0
+    while True:
+        cursor, batch = redis_request.scan(cursor=cursor, match='queue::*', count=1000)
+
+        queues.extend(batch)
+
+        if cursor == 0:
+            break
+
+    queues = sorted(set(queues))
+
+    if not queues:
+        return []
+
+    pipeline = redis_request.pipeline(transaction=False)
+
+    for queue in queues:
+        pipeline.llen(queue)
+
+    return [
+        ['harvest_task_queue_depth', [['priority', queue.split('::', 1)[-1]]], depth]
+        for queue, depth in zip(queues, pipeline.execute())
+    ]
+
+
+def record_silo_command(silo_name: str, command: str, seconds: float, error: bool = False):
+    """
+    Records one round trip to a silo.
+    """
+    labels = (('silo', silo_name), ('command', command))
+
+    metrics_registry.inc('harvest_silo_commands_total', labels)
+    metrics_registry.observe('harvest_silo_command_duration_seconds', (('silo', silo_name),), seconds)
+
+    if error:
+        metrics_registry.inc('harvest_silo_command_errors_total', labels)
+
+
+@metrics_blueprint.record_once
+def register_mongo_listener(state):
+    """
+    Registers a pymongo command listener which records every command sent to a Mongo silo. Only clients created after
+    registration are monitored, so this runs when the blueprint is registered, before the silos connect.
+    """
+    try:
+        from pymongo import monitoring
+
+    except ImportError:
+        return
+
+    class SiloCommandListener(monitoring.CommandListener):
+        def _silo_name(self, database_name: str) -> str:
+            # Names the silo after its configuration, since pymongo only knows the database
+            for silo_name, silo_config in (Environment.get('silos') or {}).items():
+                if isinstance(silo_config, dict) and silo_config.get('database') == database_name:
+                    return silo_name
+
+            return database_name
+
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            record_silo_command(self._silo_name(event.database_name), event.command_name, event.duration_micros / 1e6)
+
+        def failed(self, event):
+            record_silo_command(self._silo_name(event.database_name), event.command_name, event.duration_micros / 1e6,
+                                error=True)
+
+    monitoring.register(SiloCommandListener())
+
+
+# One registry per process
+metrics_registry = MetricsRegistry()
+
+
+@metrics_blueprint.before_app_request
+def start_request_timer():
+    g.metrics_start = perf_counter()
+    g.metrics_in_flight = True
+    metrics_registry.inc('harvest_http_requests_in_flight')
+
+
+@metrics_blueprint.after_app_request
+def record_request(response: Response) -> Response:
+    start = g.pop('metrics_start', None)
+
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = (('route', route), ('method', request.method))
+
+        metrics_registry.inc('harvest_http_requests_total', labels + (('status', str(response.status_code)),))
+        metrics_registry.observe('harvest_http_request_duration_seconds', labels, perf_counter() - start)
+
+    return response
+
+
+@metrics_blueprint.teardown_app_request
+def end_request(exception=None):
+    if g.pop('metrics_in_flight', False):
+        metrics_registry.inc('harvest_http_requests_in_flight', value=-1)
+
+
+@metrics_blueprint.route(rule='/metrics', methods=['GET'])
+def metrics() -> Response:
+    """
+    Returns the metrics of every worker on this node in the Prometheus text exposition format.
+    """
+    snapshot = merge_snapshots(metrics_registry.collect())
+
+    try:
+        snapshot['gauges'].extend(get_queue_depths())
+
+    except Exception as ex:
+        logger.debug('Failed to read the task queue depths: %s', ex)
+
+    return Response(render_metrics(snapshot), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,162 @@
+"""
+On-demand request profiling. When `api.profiling` is configured, a request is profiled with cProfile if it carries the
+`X-Harvest-Profile` header with the configured token, or if it is picked by `api.profiling.sample_rate`. The profile
+covers the whole handler, including any handlers it calls, and is written to `{api.logging.location}/profiles/` in the
+pstats format, which flameprof, snakeviz, and similar tools render as a flame graph. The response carries the profile's
+filename and its most expensive functions in the `X-Harvest-Profile-File` and `X-Harvest-Profile-Top` headers when the
+profile was requested with the token.
+
+Streamed responses, such as large PStar results and task results, do most of their work while the body is being sent,
+after the headers have gone out. Their profile is written once the body has been sent, so it covers the streaming, and
+they carry only the `X-Harvest-Profile-File` header since the summary is not known when the headers are sent.
+
+When `api.profiling` is not configured, no request hooks are installed, so requests are not slowed at all.
+"""
+from CloudHarvestCoreTasks.blueprints import HarvestApiBlueprint
+from CloudHarvestCoreTasks.environment import Environment
+from flask import Response, g, request
+from logging import getLogger
+
+logger = getLogger('harvest')
+
+profiling_blueprint = HarvestApiBlueprint(
+    'profiling_bp', __name__
+)
+
+PROFILE_HEADER = 'X-Harvest-Profile'
+
+# The number of functions reported in the `X-Harvest-Profile-Top` header
+PROFILE_TOP_FUNCTIONS = 5
+
+
+@profiling_blueprint.record_once
+def install_profiling_hooks(state):
+    """
+    Installs the profiling request hooks on the application, but only when profiling is configured.
+    """
+    config = (Environment.get('api') or {}).get('profiling') or {}
+
+    token = config.get('token')
+    sample_rate = float(config.get('sample_rate') or 0)
+
+    if not token and sample_rate <= 0:
+        return
+
+    app = state.app
+
+    @app.before_request
+    def start_profile():
+        from cProfile import Profile
+        from hmac import compare_digest
+        from random import random
+
+        requested = request.headers.get(PROFILE_HEADER)
+
+        # Only holders of the token may request a profile
+        authorized = bool(requested and token and compare_digest(requested.encode(), str(token).encode()))
+
+        if not authorized and random() >= sample_rate:
+            return
+
+        profiler = Profile()
+
+        try:
+            profiler.enable()
+
+        except ValueError:
+            # Another profiler is already active in this thread
+            return
+
+        g.profiler = profiler
+        g.profile_authorized = authorized
+
+    @app.after_request
+    def end_profile(response: Response) -> Response:
+        profiler = g.pop('profiler', None)
+
+        if profiler is None:
+            return response
+
+        authorized = g.pop('profile_authorized', False)
+        filename = get_profile_filename()
+
+        if response.is_streamed:
+            # The body is produced while it is sent, so the profile is written once the server closes the response
+            def finish_profile():
+                profiler.disable()
+
+                try:
+                    write_profile(profiler, filename)
+
+                except Exception as ex:
+                    logger.error(f'Failed to write the request profile: {ex}')
+
+            response.call_on_close(finish_profile)
+
+            # The summary is not known until the body has been sent, long after the headers
+            if authorized:
+                response.headers['X-Harvest-Profile-File'] = filename
+
+            return response
+
+        profiler.disable()
+
+        try:
+            write_profile(profiler, filename)
+
+            # Sampled profiles are only written to disk; internals are only reported to holders of the token
+            if authorized:
+                response.headers['X-Harvest-Profile-File'] = filename
+                response.headers['X-Harvest-Profile-Top'] = summarize_profile(profiler)
+
+        except Exception as ex:
+            logger.error(f'Failed to write the request profile: {ex}')
+
+        return response
+
+    logger.info(f'Request profiling enabled (sample rate: {sample_rate}, token: {"set" if token else "not set"})')
+
+
+def get_profile_filename() -> str:
+    """
+    Returns the filename of the current request's profile.
+    """
+    from datetime import datetime, timezone
+    from os import getpid
+
+    endpoint = (request.endpoint or 'unmatched').replace('/', '_')
+
+    return f'{datetime.now(tz=timezone.utc).strftime("%Y%m%dT%H%M%S.%f")}-{getpid()}-{endpoint}.prof'
+
+
+def write_profile(profiler, filename: str):
+    """
+    Writes a profile to `{api.logging.location}/profiles/{filename}`.
+    """
+    from os import makedirs
+    from os.path import abspath, expanduser, join
+
+    location = ((Environment.get('api') or {}).get('logging') or {}).get('location') or './app/logs/'
+    directory = join(abspath(expanduser(location)), 'profiles')
+    makedirs(directory, exist_ok=True)
+
+    profiler.dump_stats(join(directory, filename))
+
+
+def summarize_profile(profiler) -> str:
+    """
+    Returns the functions which spent the most time running their own code, as `seconds file:line(function)` entries
+    separated by semicolons.
+    """
+    from os.path import basename
+    from pstats import Stats
+
+    stats = Stats(profiler).stats
+
+    # Each entry is (file, line, function): (primitive calls, calls, own time, cumulative time, callers)
+    top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+
+    return '; '.join(
+        f'{own_time:.4f}s {basename(file)}:{line}({function})'
+        for (file, line, function), (_, _, own_time, _, _) in top
+    )
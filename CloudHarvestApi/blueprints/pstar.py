@@ -1,14 +1,21 @@
 from CloudHarvestCoreTasks.blueprints import HarvestApiBlueprint
+from CloudHarvestCoreTasks.environment import Environment
 from flask import Response, request
 from logging import getLogger
+from uuid import uuid4
 
+from CloudHarvestApi.blueprints.agents import agent_directory
 from CloudHarvestApi.blueprints.base import (
-    CachedData,
-    RedisRequest,
+    get_stream_threshold,
     safe_jsonify,
-    use_cache_if_valid,
+    use_cache,
+    use_etag,
     safe_request_get_json
 )
+from CloudHarvestApi.blueprints.expansion import PStarExpansion
+from CloudHarvestApi.blueprints.regions import regions_catalog
+from CloudHarvestApi.blueprints.tasks import enqueue_tasks, get_template_names, new_task, start_fanout, task_receipt
+from CloudHarvestApi.blueprints.templates import TemplateCatalog
 
 logger = getLogger('harvest')
 
@@ -18,41 +25,20 @@ pstar_blueprint = HarvestApiBlueprint(
 )
 
 
-CACHED_PLATFORM_REGIONS = CachedData(data=[], valid_age=0)
-
-
 @pstar_blueprint.route(rule='/list_accounts', methods=['GET'])
+@use_etag(agent_directory.get_accounts_version)
+@use_cache()
 def list_accounts() -> Response:
     """
     List the available platforms and accounts by retrieving them from the agent configurations.
     :return: A response.
     """
 
-    from json import loads
-
-    redis_request = RedisRequest('harvest-nodes')
-    agents = redis_request.keys('agent*')
-
     result = []
     message = 'OK'
 
     try:
-        accounts = []
-        [
-            accounts.extend(loads(redis_request.hget(agent, key='accounts')) or [])
-            for agent in agents
-        ]
-
-        # Remove duplicates
-        accounts = sorted(list(set(accounts)))
-
-        result = [
-            {
-                'platform': account.split(':')[0], 'account': account.split(':')[1]
-            }
-            for account in accounts
-            if account is not None and ':' in account
-        ]
+        result = agent_directory.get_accounts()
 
     except Exception as ex:
         message = f'Failed to list available accounts with error: {str(ex)}'
@@ -65,75 +51,50 @@ def list_accounts() -> Response:
 
 
 @pstar_blueprint.route(rule='/list_platform_regions/<platform>', methods=['GET'])
-@use_cache_if_valid(CACHED_PLATFORM_REGIONS)
+@use_cache()
 def list_platform_regions(platform: str) -> Response:
-    from json import loads
-    from CloudHarvestApi.blueprints.tasks import await_task, queue_task
-
-    redis_request = RedisRequest('harvest-nodes')
-    agents = redis_request.keys('agent*') or []
-
-    accounts = []
-
-    # Scan through the agents until we find one operating on the requested platform
-    for agent in agents:
-        agent_accounts = [
-            account.split(':')[1]
-            for account in loads(redis_request.hget(name=agent, key='accounts')) or []
-            if account.startswith(platform)
-        ]
+    """
+    List the regions of a platform. Regions are served from the `harvest-core` regions catalog, which is refreshed in
+    the background. An agent is only asked for the regions when the platform has not been cataloged yet.
 
-        if agent_accounts:
-            accounts.extend(agent_accounts)
+    Arguments
+        platform (str): The platform, such as 'aws'.
 
-    accounts = sorted(list(set(accounts)))
+    Returns:
+        A response containing a list of regions.
+    """
 
     # If no agent with an account in that platform is found, we return an empty list
-    if not accounts:
+    if not agent_directory.refresh().get(platform):
         return safe_jsonify(
             success=False,
             reason=f'Platform `{platform}` not found in agent configurations.',
             result={}
         )
 
-    # With an account number retrieved from an agent, we can now queue a task to get the regions
-    for account in accounts:
-        queue_result = queue_task(
-            priority=0,
-            task_category='reports',
-            task_name=f'{platform}.regions',
-            variables={
-                'service': 'account',
-                'type': 'regions',
-                'account': account,
-            }
-        )
-
-        try:
-            chain_id = queue_result.json['result']['id']
-
-        except Exception as ex:
-            chain_id = None
-
-        if chain_id:
-            # If the task was queued successfully, we wait for it to complete
-            task_result = await_task(chain_id).json
+    try:
+        regions = regions_catalog.get(platform)
 
-            task_result = {
-                'success': task_result.get('success'),
-                'reason': task_result.get('reason'),
-                'result': task_result['result']['data']
-            }
+        if regions is None:
+            logger.info(f'{platform}: regions have not been cataloged, retrieving them from an agent')
+            regions = regions_catalog.refresh(platform, lease=False)
 
-        else:
-            task_result = queue_result.json
+    except Exception as ex:
+        message = f'Failed to list regions for platform `{platform}` with error: {str(ex)}'
+        logger.error(message)
 
-        if task_result['result']:
-            return safe_jsonify(**task_result)
+        return safe_jsonify(
+            success=False,
+            reason=message,
+            result={}
+        )
 
-        else:
-            logger.debug(f'No regions found for {platform} {account}')
-            continue
+    if regions:
+        return safe_jsonify(
+            success=True,
+            reason='OK',
+            result=regions
+        )
 
     # If we reach this point, it means no regions were found for the platform
     return safe_jsonify(
@@ -143,38 +104,24 @@ def list_platform_regions(platform: str) -> Response:
     )
 
 @pstar_blueprint.route(rule='/list_platforms', methods=['GET'])
+@use_etag(agent_directory.get_accounts_version)
+@use_cache()
 def list_platforms() -> Response:
     """
     List the available platforms by retrieving them from the agent configurations.
     :return: A response.
     """
 
-    from json import loads
-
-    redis_request = RedisRequest('harvest-nodes')
-    agents = redis_request.keys('agent*')
-
     result = []
     message = 'OK'
 
     try:
-        platforms = []
-        for agent in agents:
-            for platform in loads(redis_request.hget(name=agent, key='accounts')) or []:
-                try:
-                    p = platform.split(':')[0]
-                    if p not in platforms and p is not None:
-                        platforms.append(p)
-
-                except Exception as ex:
-                    continue
-
         # Format as a dictionary
         result = [
             {
                 'platform': platform
             }
-            for platform in platforms
+            for platform in agent_directory.get_platforms()
         ]
 
     except Exception as ex:
@@ -188,6 +135,8 @@ def list_platforms() -> Response:
 
 
 @pstar_blueprint.route(rule='/list_services', methods=['GET'])
+@use_etag(agent_directory.get_templates_version)
+@use_cache()
 def list_services() -> Response:
     """
     List the available services.
@@ -195,20 +144,11 @@ def list_services() -> Response:
     Returns:
     """
 
-    from CloudHarvestApi.blueprints.tasks import list_available_templates
-
     services = []
-    templates = list_available_templates().json.get('result') or []
-
     message = 'OK'
 
     try:
-        for template in templates:
-            template_category, template_name = template.split('/')
-            _, template_category = template_category.split('_')
-
-            if template_category == 'services':
-                services.append(template_name)
+        services = agent_directory.get_templates().find(category='services')
 
     except Exception as ex:
         message = f'Failed to list available services with error: {str(ex)}'
@@ -216,12 +156,14 @@ def list_services() -> Response:
     return safe_jsonify(
         success=True if message == 'OK' else False,
         reason=message,
-        result=sorted(list(set(services)))
+        result=services
     )
 
 
 @pstar_blueprint.route(rule='/list_pstar', methods=['GET'])
-def list_pstar(platform=None, service=None, type=None, account=None, region=None, **kwargs) -> Response:
+@use_cache(body_keys=('platform', 'service', 'type', 'account', 'region', 'count_only'))
+def list_pstar(platform=None, service=None, type=None, account=None, region=None, count_only: bool = None,
+               **kwargs) -> Response:
     """
     Get the PStar data for a given platform, service, type, account, and region.
 
@@ -231,6 +173,8 @@ def list_pstar(platform=None, service=None, type=None, account=None, region=None
         type (str): The type to filter by.
         account (str): The account to filter by.
         region (str): The region to filter by.
+        count_only (bool): Only return the number of matching combinations, allowing clients to size a harvest
+            without retrieving it.
 
     Returns:
         Response: A JSON response containing the PStar data.
@@ -239,56 +183,28 @@ def list_pstar(platform=None, service=None, type=None, account=None, region=None
     results = []
     message = 'OK'
 
-    pstar = format_pstar(safe_request_get_json(request), platform=platform, service=service, type=type, account=account,
-                         region=region)
+    request_json = safe_request_get_json(request) or {}
+
+    pstar = format_pstar(request_json, platform=platform, service=service, type=type, account=account, region=region)
 
-    from re import findall
+    if count_only is None:
+        count_only = bool(request_json.get('count_only'))
 
     try:
-        # Get the list of available templates
-        services = list_services().json.get('result') or []
-
-        # Return matching platforms
-        platforms = [
-            p['platform']
-            for p in list_platforms().json.get('result') or []
-            if findall(pstar['platform'], p['platform'])
-        ]
+        expansion = get_pstar_expansion(pstar)
+
+        if count_only:
+            results = {
+                'count': expansion.count()
+            }
 
-        # Iterate over the PSTAR fields, creating a list of results
-        for p in platforms:
-            # Get the list of available accounts by platform
-            accounts = [
-                a['account']
-                for a in list_accounts().json.get('result') or []
-                if a['platform'] == p and findall(pstar['account'], a['account'])
-            ]
-
-            # Get the list of available regions by platform
-            regions = [
-                r['Region']
-                for r in list_platform_regions(p).json.get('result') or []
-                if findall(pstar['region'], r['Region'])
-            ]
-
-            for a in accounts:
-                for r in regions:
-                    for s in services:
-                        service_platform, s_name, s_type = s.split('.')
-                        if service_platform == p:
-                            # Check if the service matches the pstar fields
-                            if findall(pstar['service'], s_name):
-                                # Check if the type matches the pstar fields
-                                if findall(pstar['type'], s_type):
-                                    # If all PSTAR fields match, append to results
-                                    results.append({
-                                        'platform': p,
-                                        'service': s_name,
-                                        'type': s_type,
-                                        'account': a,
-                                        'region': r,
-                                        'template': s
-                                    })
+        # Expansions small enough to be sent in one piece are returned as a list, so their responses are cached
+        elif expansion.count() <= get_stream_threshold():
+            results = list(expansion.expand())
+
+        else:
+            # The dimensions were resolved by count(), so errors are reported before the response starts streaming
+            results = expansion.expand()
 
     except Exception as ex:
         message = f'Failed to list available services with error: {str(ex)}'
@@ -311,44 +227,95 @@ def queue_pstar(priority: int, platform: str = None, service: str = None, type:
         region (str, optional): The region to filter by.
 
     Returns:
-        A response object containing a list of tasks which were queued.
+        A response object containing the parent task ID and the number of tasks queued. Large expansions are enqueued
+        in the background; their progress is reported by `tasks/get_task_status/<parent>`. Otherwise, the response
+        also contains the list of tasks which were queued.
     """
 
-    from uuid import uuid4
     parent_id = str(uuid4())
 
-    pstar = format_pstar(safe_request_get_json(request),
+    request_json = safe_request_get_json(request) or {}
+
+    pstar = format_pstar(request_json,
                          platform=platform,
                          service=service,
                          type=type,
                          account=account,
                          region=region)
 
-    pstar = list_pstar(**pstar).json.get('result') or []
-
-    from CloudHarvestApi.blueprints.tasks import queue_task
-    result = [
-        queue_task(
-            priority=priority,
-            parent=parent_id,
-            task_category='services',
-            task_name=task['template'],
-            platform=task['platform'],
-            service=task['service'],
-            type=task['type'],
-            account=task['account'],
-            region=task['region']
+    tasks_config = (Environment.get('api') or {}).get('tasks') or {}
+    chunk_size = tasks_config.get('enqueue_chunk_size') or 500
+    background_threshold = tasks_config.get('background_threshold') or 1000
+
+    try:
+        # Templates are validated once for the whole expansion rather than once per task: only the services in this
+        # catalog are expanded, so `total` is the number of tasks which will actually be queued
+        templates = get_template_names()
+
+        # Regions are resolved here, inside the request, so the background fan-out only has to enumerate combinations
+        expansion = get_pstar_expansion(pstar, templates=templates)
+        total = expansion.count()
+
+        tasks = (
+            new_task(
+                priority=priority,
+                task_category='services',
+                task_name=task['template'],
+                **request_json | {
+                    'parent': parent_id,
+                    'platform': task['platform'],
+                    'service': task['service'],
+                    'type': task['type'],
+                    'account': task['account'],
+                    'region': task['region']
+                }
+            )
+            for task in expansion.expand()
+        )
+
+        if total > background_threshold:
+            start_fanout(parent_id=parent_id, tasks=tasks, total=total, chunk_size=chunk_size)
+
+            result = {
+                'parent': parent_id,
+                'total': total,
+                'background': True
+            }
+
+        else:
+            tasks = list(tasks)
+            enqueue_tasks(tasks, chunk_size=chunk_size)
+
+            result = {
+                'parent': parent_id,
+                'total': len(tasks),
+                'background': False,
+                'tasks': [
+                    {
+                        'success': True,
+                        'reason': 'OK',
+                        'result': task_receipt(task)
+                    }
+                    for task in tasks
+                ]
+            }
+
+    except Exception as ex:
+        message = f'Failed to queue pstar with error: {str(ex)}'
+        logger.error(message)
+
+        return safe_jsonify(
+            success=False,
+            reason=message,
+            result={
+                'parent': parent_id
+            }
         )
-        for task in pstar
-    ]
 
     return safe_jsonify(
         success=True,
         reason='OK',
-        result={
-            'parent': parent_id,
-            'tasks': [task.json for task in result]
-        }
+        result=result
     )
 
 def format_pstar(request_kwargs: dict,
@@ -376,3 +343,32 @@ def format_pstar(request_kwargs: dict,
     }
 
 
+def get_pstar_expansion(pstar: dict, templates: TemplateCatalog = None) -> PStarExpansion:
+    """
+    Creates a PStarExpansion from the services, accounts, and regions currently known to the API.
+
+    Arguments
+        pstar (dict): A PSTAR as returned by `format_pstar()`.
+        templates (TemplateCatalog, optional): The catalog whose service templates are expanded. Pass the catalog the
+            expanded tasks are validated against so that `count()` matches what is queued. Defaults to the current
+            catalog.
+
+    Returns
+        PStarExpansion: The expansion. Regions are only retrieved for platforms with matching services and accounts.
+    """
+
+    def regions(platform: str) -> list:
+        return [
+            r['Region']
+            for r in list_platform_regions(platform).json.get('result') or []
+        ]
+
+    if templates is None:
+        templates = agent_directory.get_templates()
+
+    return PStarExpansion(
+        pstar=pstar,
+        services=templates.find(category='services'),
+        accounts=agent_directory.refresh(),
+        regions=regions
+    )
@@ -0,0 +1,200 @@
+"""
+The platform regions catalog. Retrieving the regions of a platform requires an agent to run a `{platform}.regions`
+report, which can take minutes. The results are therefore stored in the `regions` collection of the `harvest-core` silo
+and refreshed in the background so that requests can be served from the catalog.
+"""
+from logging import getLogger
+
+from CloudHarvestApi.blueprints.agents import agent_directory
+
+logger = getLogger('harvest')
+
+
+class PlatformRegionsCatalog:
+    """
+    Stores the regions of each platform in the `harvest-core` silo.
+
+    Each platform is stored as a single document:
+        >>> {
+        >>>     'Platform': 'aws',
+        >>>     'Regions': [{'Region': 'us-east-1', ...}, ...],
+        >>>     'Updated': datetime,            # When the regions were last retrieved
+        >>>     'Expires': float,               # Epoch seconds after which the regions are refreshed
+        >>>     'RefreshLease': float           # Epoch seconds until which a node holds the right to refresh the platform
+        >>> }
+
+    Arguments
+    silo (str, optional): The silo storing the catalog. Defaults to 'harvest-core'.
+    collection (str, optional): The collection storing the catalog. Defaults to 'regions'.
+    refresh_seconds (int, optional): The number of seconds after which a platform's regions are refreshed.
+    timeout (int, optional): The number of seconds to wait for an agent to report a platform's regions.
+    """
+
+    def __init__(self, silo: str = 'harvest-core', collection: str = 'regions', refresh_seconds: int = 3600,
+                 timeout: int = 120):
+        self.silo = silo
+        self.collection = collection
+        self.refresh_seconds = refresh_seconds
+        self.timeout = timeout
+
+    def _collection(self):
+        from CloudHarvestCoreTasks.silos import get_silo
+
+        silo = get_silo(self.silo)
+
+        # Returns a MongoClient object
+        client = silo.connect()
+
+        return client[silo.database][self.collection]
+
+    def get(self, platform: str) -> list or None:
+        """
+        Returns the stored regions of a platform, or None if the platform has not been cataloged.
+        """
+        document = self._collection().find_one({'Platform': platform}, projection={'_id': 0, 'Regions': 1})
+
+        return (document or {}).get('Regions')
+
+    def refresh(self, platform: str, lease: bool = True) -> list:
+        """
+        Retrieves the regions of a platform from an agent and stores them in the catalog.
+
+        Arguments
+        platform (str): The platform to refresh.
+        lease (bool, optional): When True, the platform is only refreshed if no other node is currently refreshing it.
+            Defaults to True.
+
+        Returns
+        list: The regions of the platform. The list is empty if the regions could not be retrieved or if another node
+        holds the refresh lease.
+        """
+        from datetime import datetime, timezone
+        from time import time
+
+        collection = self._collection()
+
+        if lease:
+            try:
+                # Claims the platform unless another node's lease is still active. When the lease is held, the filter
+                # does not match and the upsert fails on the unique Platform index.
+                collection.find_one_and_update(
+                    {'Platform': platform, 'RefreshLease': {'$not': {'$gt': time()}}},
+                    {'$set': {'RefreshLease': time() + self.timeout}},
+                    upsert=True
+                )
+
+            except Exception as ex:
+                logger.debug(f'{platform}: regions are being refreshed by another node: {ex}')
+                return []
+
+        regions = []
+
+        try:
+            regions = self.fetch(platform)
+
+        finally:
+            # Without regions, the lease is released at once so another node or the next warm may retry the platform
+            if not regions:
+                collection.update_one({'Platform': platform}, {'$unset': {'RefreshLease': ''}})
+
+        if regions:
+            collection.update_one(
+                {'Platform': platform},
+                {
+                    '$set': {
+                        'Regions': regions,
+                        'Updated': datetime.now(tz=timezone.utc),
+                        'Expires': time() + self.refresh_seconds
+                    },
+                    '$unset': {'RefreshLease': ''}
+                },
+                upsert=True
+            )
+
+            logger.info(f'{platform}: cataloged {len(regions)} regions')
+
+        return regions
+
+    def fetch(self, platform: str) -> list:
+        """
+        Queues a `{platform}.regions` report for each account on the platform until an agent returns the regions.
+
+        Returns
+        list: The regions reported by the agent, or an empty list if none were found.
+        """
+        from CloudHarvestApi.blueprints.base import RedisRequest
+        from CloudHarvestApi.blueprints.tasks import (
+            delete_task,
+            enqueue_tasks,
+            get_template_names,
+            iter_task_data,
+            new_task,
+            spool_task_data,
+            wait_for_task
+        )
+        from CloudHarvestCoreTasks.tasks.redis import unformat_hset
+
+        if ('reports', f'{platform}.regions') not in get_template_names():
+            logger.warning(f'{platform}: no agent provides the `{platform}.regions` report')
+            return []
+
+        redis_request = RedisRequest(silo='harvest-tasks')
+
+        for account in agent_directory.refresh().get(platform) or []:
+            task = new_task(
+                priority=0,
+                task_category='reports',
+                task_name=f'{platform}.regions',
+                variables={
+                    'service': 'account',
+                    'type': 'regions',
+                    'account': account,
+                }
+            )
+
+            enqueue_tasks([task])
+
+            status = wait_for_task(task['redis_name'], timeout=self.timeout)
+
+            regions = []
+            if status == 'complete':
+                # Another node may have read the task in chunks, which moves its records out of the task hash
+                if spool_task_data(redis_request, task['redis_name']) is None:
+                    regions = unformat_hset(redis_request.hgetall(name=task['redis_name'])).get('data') or []
+
+                else:
+                    regions = list(iter_task_data(redis_request, task['redis_name']))
+
+                # The results are kept in the catalog, so the task is no longer needed
+                delete_task(redis_request, task['redis_name'])
+
+            if regions:
+                return regions
+
+            logger.debug(f'No regions found for {platform} {account} (status: {status})')
+
+        return []
+
+    def warm(self):
+        """
+        Refreshes every platform served by the agents whose regions are missing or have expired.
+        """
+        from time import time
+
+        cataloged = {
+            document['Platform']: document.get('Expires') or 0
+            for document in self._collection().find({'Regions': {'$exists': True}},
+                                                    projection={'_id': 0, 'Platform': 1, 'Expires': 1})
+        }
+
+        for platform in agent_directory.get_platforms():
+            if cataloged.get(platform, 0) <= time():
+                try:
+                    self.refresh(platform)
+
+                except Exception as ex:
+                    logger.error(f'{platform}: failed to refresh regions: {ex}')
+
+
+# One catalog per process
+regions_catalog = PlatformRegionsCatalog()
@@ -2,6 +2,8 @@ from CloudHarvestCoreTasks.blueprints import HarvestApiBlueprint
 from CloudHarvestCoreTasks.environment import Environment
 from flask import Response, jsonify
 
+from CloudHarvestApi.blueprints.base import content_version, use_etag
+
 
 silos_blueprint = HarvestApiBlueprint(
     'silos_bp', __name__,
@@ -26,7 +28,15 @@ def get_silo(silo_name: str) -> Response:
         'result': result
     })
 
+def get_silos_version() -> str:
+    """
+    Returns the content hash of the silo configurations.
+    """
+    return content_version(Environment.get('silos', {}))
+
+
 @silos_blueprint.route(rule='/get_all', methods=['GET'])
+@use_etag(get_silos_version)
 def get_all_silo() -> Response:
     """
     Gets the configuration of all silos registered in the node.
@@ -36,12 +46,17 @@ def get_all_silo() -> Response:
 
     result = Environment.get('silos', {})
 
-    return jsonify({
+    response = jsonify({
         'success': bool(result),
         'message': 'No silos found' if not result else 'OK',
         'result': result
     })
 
+    # Read by `use_etag`, which only tags successful responses
+    response.harvest_success = bool(result)
+
+    return response
+
 @silos_blueprint.route(rule='/list', methods=['GET'])
 def list_silos() -> Response:
 
@@ -1,10 +1,18 @@
 from CloudHarvestCoreTasks.blueprints import HarvestApiBlueprint
+from CloudHarvestCoreTasks.environment import Environment
+from datetime import datetime, timezone
 from flask import Response, request
+from json import dumps, loads
 from logging import getLogger
+from threading import Lock, Thread
+from time import monotonic, time
+from traceback import format_exc
+from uuid import uuid4
 
-from CloudHarvestApi.blueprints.base import RedisRequest, safe_jsonify, safe_request_get_json, use_cache_if_valid
+from CloudHarvestApi.blueprints.agents import agent_directory
+from CloudHarvestApi.blueprints.base import RawJSON, RedisRequest, safe_jsonify, safe_request_get_json, use_cache, use_etag
 from CloudHarvestApi.blueprints.home import not_implemented_error
-from CloudHarvestCoreTasks.cache import CachedData
+from CloudHarvestApi.blueprints.templates import TemplateCatalog
 from CloudHarvestCoreTasks.tasks.redis import format_hset, unformat_hset
 
 logger = getLogger('harvest')
@@ -14,7 +22,213 @@ tasks_blueprint = HarvestApiBlueprint(
     url_prefix='/tasks'
 )
 
-CACHED_TEMPLATES = CachedData(data=[], valid_age=0)
+# Secondary index keys used to find tasks without scanning the entire `harvest-tasks` keyspace. These prefixes
+# intentionally do not start with `task:` so they are not returned by `task:*` scans.
+TASK_ID_INDEX_PREFIX = 'task-id'
+TASK_CHILDREN_INDEX_PREFIX = 'task-children'
+TASK_FANOUT_PREFIX = 'task-fanout'
+TASK_DATA_PREFIX = 'task-data'
+TASK_EXPIRATION_SECONDS = 3600
+
+# A task chain ID which is not indexed and was not found by the legacy SCAN is not scanned for again for this long
+LEGACY_SCAN_MISS_SECONDS = 60
+LEGACY_SCAN_MISS_MAX_ENTRIES = 10000
+
+# Waiters look for tasks added to a task chain at least this often
+AWAIT_RESOLVE_SECONDS = 5
+
+# A fan-out which has not queued any tasks for this long has lost its worker, such as to a restart, and is reported as
+# failed
+FANOUT_STALE_SECONDS = 120
+
+# Task results are read from Redis this many records at a time, and no chunk may be larger than the maximum
+TASK_RESULT_CHUNK_SIZE = 1000
+TASK_RESULT_MAX_CHUNK_SIZE = 10000
+
+# The task fields reported by status checks; results are excluded as they may be large
+TASK_STATUS_FIELDS = (
+    'redis_name',
+    'id',
+    'parent',
+    'name',
+    'type',
+    'status',
+    'agent',
+    'position',
+    'total',
+    'start',
+    'end'
+)
+
+# The task fields which may be included when listing tasks
+TASK_LIST_FIELDS = TASK_STATUS_FIELDS + ('priority', 'category', 'created')
+
+
+def find_task_names(redis_request: RedisRequest, task_chain_id: str) -> list:
+    """
+    Finds the Redis names of a task and its children using the task index. Tasks queued before the index existed are
+    located with a SCAN of the `task:*` keyspace, unless `api.tasks.legacy_scan` is false. A task chain ID which the SCAN
+    did not find is not scanned for again for LEGACY_SCAN_MISS_SECONDS, so unknown IDs cannot repeat its cost.
+
+    Arguments
+    redis_request (RedisRequest): A RedisRequest for the `harvest-tasks` silo.
+    task_chain_id (str): The task chain ID (uuid4) or the ID of a parent task.
+
+    Returns
+    list: The Redis names matching the task chain ID. The list is empty when the task could not be found.
+    """
+
+    names = []
+
+    # O(1): the task itself
+    redis_name = redis_request.get(name=f'{TASK_ID_INDEX_PREFIX}:{task_chain_id}')
+    if redis_name:
+        names.append(redis_name)
+
+    # O(children): tasks queued with this task chain ID as their parent
+    children = redis_request.smembers(name=f'{TASK_CHILDREN_INDEX_PREFIX}:{task_chain_id}') or []
+    names.extend(sorted(child for child in children if child not in names))
+
+    if names:
+        return names
+
+    # Tasks are always indexed now, so the SCAN only finds tasks queued before the index existed
+    if ((Environment.get('api') or {}).get('tasks') or {}).get('legacy_scan', True) is False \
+            or legacy_scan_misses.contains(task_chain_id):
+        return names
+
+    # Fall back to scanning for tasks which were queued without an index entry
+    logger.debug('[%s] task not indexed, scanning for task', task_chain_id)
+
+    cursor = 0
+    while True:
+        cursor, batch = redis_request.scan(cursor=cursor, match=f'task:*{escape_glob(task_chain_id)}*', count=100)
+
+        names.extend(batch)
+
+        if cursor == 0:
+            break
+
+    if not names:
+        legacy_scan_misses.add(task_chain_id)
+
+    return names
+
+
+class ScanMissCache:
+    """
+    Remembers the task chain IDs which a legacy SCAN did not find, for `ttl` seconds.
+
+    Arguments
+    ttl (float): The number of seconds an ID is remembered.
+    max_entries (int): The maximum number of IDs remembered; the oldest are forgotten first.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._entries = {}                  # task chain ID -> expires, in insertion order
+        self._lock = Lock()
+
+    def add(self, task_chain_id: str):
+        with self._lock:
+            self._entries.pop(task_chain_id, None)
+            self._entries[task_chain_id] = monotonic() + self.ttl
+
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+
+    def contains(self, task_chain_id: str) -> bool:
+        with self._lock:
+            expires = self._entries.get(task_chain_id)
+
+            if expires is None:
+                return False
+
+            if expires <= monotonic():
+                del self._entries[task_chain_id]
+                return False
+
+            return True
+
+
+# One cache per process shared by all lookups
+legacy_scan_misses = ScanMissCache(ttl=LEGACY_SCAN_MISS_SECONDS, max_entries=LEGACY_SCAN_MISS_MAX_ENTRIES)
+
+
+def escape_glob(value: str) -> str:
+    """
+    Escapes the glob characters in a value so that it only matches itself in a SCAN or KEYS pattern.
+    """
+    return ''.join(f'\\{character}' if character in '*?[]\\' else character for character in value)
+
+
+def index_task(redis_request: RedisRequest, task: dict):
+    """
+    Records a task in the task index so it can be retrieved by ID or by parent ID without a SCAN.
+
+    Arguments
+    redis_request (RedisRequest): A RedisRequest or pipeline for the `harvest-tasks` silo.
+    task (dict): The task being queued. Must contain the `id`, `parent`, and `redis_name` keys.
+    """
+
+    redis_request.set(name=f'{TASK_ID_INDEX_PREFIX}:{task["id"]}',
+                      value=task['redis_name'],
+                      ex=TASK_EXPIRATION_SECONDS)
+
+    if task.get('parent'):
+        children_name = f'{TASK_CHILDREN_INDEX_PREFIX}:{task["parent"]}'
+        redis_request.sadd(children_name, task['redis_name'])
+        redis_request.expire(name=children_name, time=TASK_EXPIRATION_SECONDS)
+
+
+def wait_for_task(redis_name: str, timeout: float = 120) -> str:
+    """
+    Waits for a single task to reach the `complete` or `error` status.
+
+    Arguments
+    redis_name (str): The Redis name of the task.
+    timeout (float, optional): The maximum number of seconds to wait. Defaults to 120.
+
+    Returns
+    str: The last status of the task.
+    """
+    from CloudHarvestApi.blueprints.events import task_event_listener
+
+    redis_request = RedisRequest(silo='harvest-tasks')
+    deadline = monotonic() + timeout
+
+    with task_event_listener.watch([redis_name]) as task_changed:
+        while True:
+            status = redis_request.hget(name=redis_name, key='status')
+            remaining = deadline - monotonic()
+
+            if status in ('complete', 'error') or remaining <= 0:
+                return status
+
+            if not task_event_listener.is_active:
+                remaining = min(remaining, 1)
+
+            task_changed.wait(timeout=remaining)
+            task_changed.clear()
+
+
+def unindex_task(redis_request: RedisRequest, redis_name: str):
+    """
+    Removes a task from the task index.
+
+    Arguments
+    redis_request (RedisRequest): A RedisRequest for the `harvest-tasks` silo.
+    redis_name (str): The Redis name of the task, formatted as `task:{parent}:{id}`.
+    """
+
+    _, parent, task_id = redis_name.split(':', 2)
+
+    redis_request.delete(f'{TASK_ID_INDEX_PREFIX}:{task_id}')
+
+    if parent:
+        redis_request.srem(f'{TASK_CHILDREN_INDEX_PREFIX}:{parent}', redis_name)
 
 
 @tasks_blueprint.route(rule='/await/<task_chain_id>', methods=['GET'])
@@ -25,35 +239,49 @@ def await_task(task_chain_id: str) -> Response:
     Arguments
     task_chain_id: (str) The task chain ID (uuid4)
 
+    Arguments (request JSON)
+    timeout (int, optional): The number of seconds to wait for the task. Defaults to 120.
+    The arguments of `get_task_result`, such as `pop`, apply to the result returned once the task is complete.
+
     Returns
     A response with the task chain results.
     """
-
-    from datetime import datetime
-    from time import sleep
+    from CloudHarvestApi.blueprints.events import task_event_listener
 
     request_json = safe_request_get_json(request)
 
-    start_time = datetime.now()
     timeout = request_json.get('timeout') or 120
+    deadline = monotonic() + timeout
 
-    while (datetime.now() - start_time).total_seconds() < timeout:
-        output = get_task_status(task_chain_id=task_chain_id).get_json()
-        status = output.get('result', {}).get('status')
+    redis_request = RedisRequest(silo='harvest-tasks')
 
-        match status:
-            case 'complete' | 'error':
+    while True:
+        # The children of a background fan-out are enqueued over time, so the task names are resolved again each time
+        # the waiter wakes. The task is watched before its status is checked so a completion between the two cannot be
+        # missed.
+        names = find_task_names(redis_request, task_chain_id)
+
+        with task_event_listener.watch(names) as task_changed:
+            output = get_task_status(task_chain_id=task_chain_id).get_json()
+            status = (output.get('result') or {}).get('status')
+
+            if status in ('complete', 'error'):
                 break
 
-            case _:
-                sleep(1)
+            remaining = deadline - monotonic()
 
-    else:
-        return safe_jsonify(
-            success=False,
-            reason='TIMEOUT',
-            result=None
-        )
+            if remaining <= 0:
+                return safe_jsonify(
+                    success=False,
+                    reason='TIMEOUT',
+                    result=None
+                )
+
+            # Without task events (unknown task or notifications unavailable) we fall back to polling once per second
+            if not (names and task_event_listener.is_active):
+                remaining = min(remaining, 1)
+
+            task_changed.wait(timeout=min(remaining, AWAIT_RESOLVE_SECONDS))
 
     return get_task_result(task_chain_id=task_chain_id)
 
@@ -61,39 +289,41 @@ def await_task(task_chain_id: str) -> Response:
 @tasks_blueprint.route(rule='/get_task_result/<task_chain_id>', methods=['GET'])
 def get_task_result(task_chain_id: str, **kwargs) -> Response:
     """
-    Returns the results of a task chain.
-    Args:
-        task_chain_id: A task chain ID (uuid4)
+    Returns the results of a task chain. The `data` records may be read in chunks by passing `offset`, `limit`, or the
+    `token` returned with the previous chunk. Without them, all records are streamed.
 
-    Returns:
-        A response with the task chain results.
+    Arguments
+    task_chain_id (str): A task chain ID (uuid4)
+
+    Arguments (request JSON)
+    pop (bool, optional): Delete the task once its result has been read. When reading in chunks, the task is deleted
+        once the final chunk has been read.
+    offset (int, optional): The index of the first `data` record to return. Defaults to 0.
+    limit (int, optional): The number of `data` records to return, up to 10000. Defaults to 1000 when reading in
+        chunks.
+    token (str, optional): The continuation token returned with the previous chunk.
+
+    Returns
+    A response with the task chain results. Chunks include the `total` number of records and the `token` of the next
+    chunk, which is None once the final chunk has been read.
     """
     redis_request = RedisRequest(silo='harvest-tasks')
 
     reason = 'OK'
     results = {}
 
-    request_json = safe_request_get_json(request)
+    request_json = safe_request_get_json(request) or {}
 
     try:
-        cursor = 0
-        while True:
-            cursor, batch = redis_request.scan(cursor=cursor, match=f'task:*{task_chain_id}*', count=100)
-
-            if batch:
-                redis_name = batch[0]
-                break
-
-            if cursor == 0:
-                redis_name = None
-                break
+        names = find_task_names(redis_request, task_chain_id)
+        redis_name = names[0] if names else None
 
-        logger.debug(f'[{task_chain_id}] redis name: {redis_name}')
+        logger.debug('[%s] redis name: %s', task_chain_id, redis_name)
 
         if redis_name:
             status = redis_request.hget(name=redis_name, key='status')
 
-            logger.debug(f'[{task_chain_id}] task status: {status}')
+            logger.debug('[%s] task status: %s', task_chain_id, status)
 
             # if the task is not complete, we don't want to return the result
             if status != 'complete':
@@ -102,22 +332,40 @@ def get_task_result(task_chain_id: str, **kwargs) -> Response:
                 }
 
             else:
-                logger.debug(f'[{task_chain_id}] task is complete, fetching results')
-                result = redis_request.hgetall(name=redis_name)
+                logger.debug('[%s] task is complete, fetching results', task_chain_id)
+                total = spool_task_data(redis_request, redis_name)
 
-                logger.debug(f'[{task_chain_id}] formatting results')
-                results = unformat_hset(result)
+                # The records are no longer part of the task hash, so this is small whatever the result size
+                results = unformat_hset(redis_request.hgetall(name=redis_name))
 
-                if request_json.get('pop'):
-                    logger.debug(f'[{task_chain_id}] fetch complete, removing results from cache')
-                    # if the task is complete, we want to remove it from the queue
-                    redis_request.delete(redis_name)
+                pop = bool(request_json.get('pop'))
+
+                if total is None:
+                    # The result is not a list of records, so it was returned whole by HGETALL
+                    if pop:
+                        delete_task(redis_request, redis_name)
+
+                elif any(key in request_json for key in ('offset', 'limit', 'token')):
+                    offset = max(int(request_json.get('token') or request_json.get('offset') or 0), 0)
+                    limit = min(max(int(request_json.get('limit') or TASK_RESULT_CHUNK_SIZE), 1), TASK_RESULT_MAX_CHUNK_SIZE)
+
+                    results['data'] = read_task_data(redis_request, redis_name, offset, offset + limit)
+                    results['total'] = total
+                    results['token'] = str(offset + limit) if offset + limit < total else None
+
+                    if pop and results['token'] is None:
+                        logger.debug('[%s] final chunk read, removing results from cache', task_chain_id)
+                        delete_task(redis_request, redis_name)
+
+                else:
+                    # Streams every record, deleting the task only once the last one has been sent
+                    results['data'] = iter_task_data(redis_request, redis_name, raw=True,
+                                                     on_complete=(lambda: delete_task(redis_request, redis_name)) if pop else None)
 
         else:
             reason = 'NOT FOUND'
 
     except BaseException as ex:
-        from traceback import format_exc
         reason = f'Failed to get task results with error: {str(ex.args)}'
         logger.error(f'{reason}\n{format_exc()}')
 
@@ -127,6 +375,120 @@ def get_task_result(task_chain_id: str, **kwargs) -> Response:
         result=results
     )
 
+
+def task_data_name(redis_name: str) -> str:
+    """
+    Returns the name of the list holding a task's `data` records.
+    """
+    return f'{TASK_DATA_PREFIX}:{redis_name.rsplit(":", 1)[-1]}'
+
+
+def spool_task_data(redis_request: RedisRequest, redis_name: str) -> int or None:
+    """
+    Moves the `data` records of a completed task from the task hash into a list with one record per item, so that the
+    records can be read in ranges. A task's result is only parsed once; later reads only touch the requested records.
+
+    Agents should write their records to the list directly. A result written as a single `data` field has to be read
+    and parsed whole, so spooling it holds the parsed records in memory; they are written in batches of
+    TASK_RESULT_MAX_CHUNK_SIZE so that no more than one batch is encoded at a time.
+
+    Arguments
+    redis_request (RedisRequest): A RedisRequest for the `harvest-tasks` silo.
+    redis_name (str): The Redis name of the task.
+
+    Returns
+    int or None: The number of records, or None if the task's `data` is missing, empty, or not a list, in which case it
+    is left in the task hash.
+    """
+    data_name = task_data_name(redis_name)
+
+    pipeline = redis_request.pipeline(transaction=False)
+    pipeline.hexists(redis_name, 'data')
+    pipeline.llen(data_name)
+    pipeline.ttl(redis_name)
+    has_data, total, ttl = pipeline.execute()
+
+    if not has_data:
+        # Either the records were already spooled, or the task has no records at all
+        return total or None
+
+    records = unformat_hset({'data': redis_request.hget(name=redis_name, key='data')}).get('data')
+
+    if not isinstance(records, list) or not records:
+        return None
+
+    expiration = ttl if ttl and ttl > 0 else TASK_EXPIRATION_SECONDS
+
+    # Each reader spools into its own list, which only replaces the task's list once it is whole, so readers never see
+    # a partial list and concurrent spools of the same task cannot interleave their records
+    spool_name = f'{data_name}:spool:{uuid4()}'
+
+    for batch_start in range(0, len(records), TASK_RESULT_MAX_CHUNK_SIZE):
+        pipeline = redis_request.pipeline(transaction=False)
+
+        for start in range(batch_start, min(batch_start + TASK_RESULT_MAX_CHUNK_SIZE, len(records)), TASK_RESULT_CHUNK_SIZE):
+            pipeline.rpush(spool_name, *(dumps(record, default=str) for record in records[start:start + TASK_RESULT_CHUNK_SIZE]))
+
+        # The spool list expires with the task should this reader fail before it is renamed
+        pipeline.expire(spool_name, expiration)
+        pipeline.execute()
+
+    pipeline = redis_request.pipeline(transaction=True)
+    pipeline.rename(spool_name, data_name)
+    pipeline.expire(data_name, expiration)
+    pipeline.hdel(redis_name, 'data')
+    pipeline.execute()
+
+    return len(records)
+
+
+def read_task_data(redis_request: RedisRequest, redis_name: str, start: int, stop: int) -> list:
+    """
+    Returns the `data` records of a task from index `start` up to, but excluding, `stop`.
+    """
+    if stop <= start:
+        return []
+
+    return [loads(record) for record in redis_request.lrange(task_data_name(redis_name), start, stop - 1)]
+
+
+def iter_task_data(redis_request: RedisRequest, redis_name: str, on_complete=None, raw: bool = False):
+    """
+    Yields every `data` record of a task, reading TASK_RESULT_CHUNK_SIZE records at a time. `on_complete` is called
+    once the last record has been yielded. When `raw` is True, the records are yielded as `RawJSON` without being
+    decoded, for use with `stream_jsonify`.
+    """
+    data_name = task_data_name(redis_name)
+    start = 0
+
+    while True:
+        records = redis_request.lrange(data_name, start, start + TASK_RESULT_CHUNK_SIZE - 1)
+
+        if raw:
+            records = [RawJSON(record.encode() if isinstance(record, str) else record) for record in records]
+
+        else:
+            records = [loads(record) for record in records]
+
+        yield from records
+
+        if len(records) < TASK_RESULT_CHUNK_SIZE:
+            break
+
+        start += TASK_RESULT_CHUNK_SIZE
+
+    if on_complete:
+        on_complete()
+
+
+def delete_task(redis_request: RedisRequest, redis_name: str):
+    """
+    Deletes a task, its `data` records, and its index entries.
+    """
+    redis_request.delete(redis_name, task_data_name(redis_name))
+    unindex_task(redis_request, redis_name)
+
+
 @tasks_blueprint.route(rule='/get_task_status/<task_chain_id>', methods=['GET'])
 def get_task_status(task_chain_id: str) -> Response:
     """
@@ -142,19 +504,7 @@ def get_task_status(task_chain_id: str) -> Response:
     reason = 'OK'
 
     # for status checks, we do not want to return the result as it may be large
-    fields = (
-        'redis_name',
-        'id',
-        'parent',
-        'name',
-        'type',
-        'status',
-        'agent',
-        'position',
-        'total',
-        'start',
-        'end'
-    )
+    fields = TASK_STATUS_FIELDS
 
     def rekey_dict(redis_response: list):
         """
@@ -170,17 +520,13 @@ def get_task_status(task_chain_id: str) -> Response:
     try:
         redis_request = RedisRequest(silo='harvest-tasks')
 
-        names = []
-        cursor = 0
-        while True:
-            cursor, batch = redis_request.scan(cursor=cursor, match=f'task:*{task_chain_id}*', count=100)
-
-            names.extend(batch)
+        names = find_task_names(redis_request, task_chain_id)
 
-            if cursor == 0:
-                break
+        # Parents of a background fan-out report their progress while their tasks are still being enqueued
+        fanout = redis_request.hgetall(name=f'{TASK_FANOUT_PREFIX}:{task_chain_id}') or {}
 
-        if len(names) == 0:
+        # A fan-out which finished without any tasks, or whose tasks have all expired, has nothing to report on
+        if len(names) == 0 and (not fanout or fanout.get('status') == 'complete'):
             reason = 'NOT FOUND'
             return safe_jsonify(
                 success=False,
@@ -188,7 +534,7 @@ def get_task_status(task_chain_id: str) -> Response:
                 result=result
             )
 
-        elif len(names) == 1:
+        elif len(names) == 1 and not fanout:
             result = rekey_dict(unformat_hset(redis_request.hmget(names[0], keys=fields)))
 
         else:
@@ -243,6 +589,25 @@ def get_task_status(task_chain_id: str) -> Response:
                 'end': try_aggregate(max, 'end')
             }
 
+            if fanout:
+                result['parent'] = task_chain_id
+                result['redis_name'] = f'task:{task_chain_id}'
+                result['total'] = max(int(fanout.get('total') or 0), result['total'])
+
+                match fanout.get('status'):
+                    case 'enqueueing' if is_stale_fanout(fanout):
+                        logger.error('[%s] fan-out stopped after queueing %s of %s tasks',
+                                     task_chain_id, fanout.get('queued'), fanout.get('total'))
+
+                        redis_request.hset(name=f'{TASK_FANOUT_PREFIX}:{task_chain_id}', key='status', value='error')
+                        result['status'] = 'error'
+
+                    case 'enqueueing':
+                        result['status'] = 'running'
+
+                    case 'error':
+                        result['status'] = 'error'
+
     except Exception as ex:
         reason = f'Failed to get task status with error: {str(ex)}'
         logger.error(reason)
@@ -254,36 +619,25 @@ def get_task_status(task_chain_id: str) -> Response:
     )
 
 
-@use_cache_if_valid(CACHED_TEMPLATES)
 @tasks_blueprint.route(rule='/list_available_templates', methods=['GET'])
+@use_etag(agent_directory.get_templates_version)
+@use_cache()
 def list_available_templates() -> Response:
     """
     List the available task templates.
     :return: A response.
     """
 
-    redis_request = RedisRequest(silo='harvest-nodes')
-
     reason = 'OK'
     results = []
 
     try:
-        agents = redis_request.keys(pattern='agent*')
-        for agent in agents:
-            agent_templates = unformat_hset(redis_request.hget(name=agent, key='available_templates')) or []
-            results.extend(agent_templates)
+        results = agent_directory.get_templates().templates
 
     except Exception as ex:
         reason = f'Failed to list task results with error: {str(ex)}'
         logger.error(reason)
 
-    results = sorted(list(set(results)))
-
-    # We only cache the templates if we have results
-    if results:
-        # Update the CACHED_TEMPLATES so subsequent calls will be faster
-        CACHED_TEMPLATES.update(data=results, valid_age=300)
-
     return safe_jsonify(
         success=True,
         reason=reason,
@@ -294,36 +648,127 @@ def list_available_templates() -> Response:
 @tasks_blueprint.route(rule='/list_tasks', methods=['GET'])
 def list_tasks() -> Response:
     """
-    Lists all task results.
-    :return: A response.
+    Lists tasks one page at a time.
+
+    Arguments (request JSON)
+    limit (int, optional): The approximate number of tasks to return. Defaults to 100, up to 1000.
+    token (str, optional): The continuation token returned by the previous page.
+    include (list or str, optional): Task fields to return with each task, such as ['status'] or 'status,priority'.
+    status (list or str, optional): Only return tasks with one of these statuses.
+    parent (str, optional): Only return tasks with this parent task ID.
+    priority (int, optional): Only return tasks with this priority.
+    max_age (float, optional): Only return tasks created within this many seconds.
+
+    :return: A response of
+    >>> {
+    >>>     'success': True,
+    >>>     'reason': 'OK',
+    >>>     'result': {
+    >>>         'tasks': ['task:parent:id', ...] or [{'redis_name': 'task:parent:id', 'status': 'complete'}, ...],
+    >>>         'token': '1792'     # None when there are no more tasks
+    >>>     }
+    >>> }
+
+    Filters are applied after each page is retrieved, so a page may contain fewer tasks than the limit while more pages
+    remain. Clients should continue until the token is None.
     """
 
     reason = 'OK'
-    results = []
+    tasks = []
+    token = None
+
+    request_json = safe_request_get_json(request) or {}
+
+    def as_list(value) -> list:
+        if value is None or value == '':
+            return []
+
+        return value.split(',') if isinstance(value, str) else list(value)
 
     try:
-        redis_request = RedisRequest(silo='harvest-tasks')
+        limit = min(max(int(request_json.get('limit') or 100), 1), 1000)
+        cursor = int(request_json.get('token') or 0)
 
-        results = []
-        cursor = 0
+        include = [field for field in as_list(request_json.get('include')) if field in TASK_LIST_FIELDS]
+        statuses = as_list(request_json.get('status'))
+        priority = request_json.get('priority')
+        max_age = request_json.get('max_age')
 
-        # Use SCAN to fetch keys in batches of 100
-        while True:
-            cursor, batch = redis_request.scan(cursor=cursor, match='task:*', count=100)
+        # The parent is part of the task name, so it is filtered by SCAN itself
+        parent = request_json.get('parent')
+        match = f'task:{escape_glob(str(parent))}:*' if parent else 'task:*'
 
-            if batch:
-                results.extend(batch)
+        redis_request = RedisRequest(silo='harvest-tasks')
 
-            if cursor == 0:
+        names = []
+        while True:
+            cursor, batch = redis_request.scan(cursor=cursor, match=match, count=limit)
+            names.extend(batch)
+
+            if cursor == 0 or len(names) >= limit:
                 break
 
+        token = str(cursor) if cursor else None
+
+        # Fields needed for filtering are fetched alongside the included fields in a single round trip
+        fields = list(dict.fromkeys(
+            include
+            + (['status'] if statuses else [])
+            + (['priority'] if priority is not None else [])
+            + (['created'] if max_age is not None else [])
+        ))
+
+        if not fields:
+            tasks = names
+
+        else:
+            pipeline = redis_request.pipeline(transaction=False)
+            for name in names:
+                pipeline.hmget(name, fields)
+
+            now = datetime.now(tz=timezone.utc)
+
+            for name, values in zip(names, pipeline.execute()):
+                task = unformat_hset(dict(zip(fields, values)))
+
+                if statuses and task['status'] not in statuses:
+                    continue
+
+                if priority is not None and str(task['priority']) != str(priority):
+                    continue
+
+                if max_age is not None:
+                    try:
+                        created = task['created']
+
+                        if not isinstance(created, datetime):
+                            created = datetime.fromisoformat(created)
+
+                        if created.tzinfo is None:
+                            created = created.replace(tzinfo=timezone.utc)
+
+                    except (TypeError, ValueError):
+                        continue
+
+                    if (now - created).total_seconds() > float(max_age):
+                        continue
+
+                if include:
+                    tasks.append({'redis_name': name} | {field: task[field] for field in include})
+
+                else:
+                    tasks.append(name)
+
     except Exception as ex:
         reason = f'Failed to list task results with error: {str(ex)}'
         logger.error(reason)
 
     return safe_jsonify(success=reason == 'OK',
                         reason=reason,
-                        result=results)
+                        result={
+                            'tasks': tasks,
+                            'token': token
+                        })
 
 
 @tasks_blueprint.route(rule='/escalate/<task_id>', methods=['GET'])
@@ -351,19 +796,7 @@ def queue_task(priority: int, task_category: str, task_name: str, *args, **kwarg
     :return: A response.
     """
 
-    templates = list_available_templates().get_json().get('result')
-
-    template_exists = False
-    for template in templates:
-        category, name = template.split('/')
-        category = category.replace('template_', '')
-
-        if category == task_category and name == task_name:
-            template_exists = True
-            break
-
-
-    if not template_exists:
+    if (task_category, task_name) not in get_template_names():
         return safe_jsonify(
             success=False,
             reason=f'TEMPLATE NOT FOUND',
@@ -371,11 +804,56 @@ def queue_task(priority: int, task_category: str, task_name: str, *args, **kwarg
         )
 
     # The task is known to exist on some agent, therefore it can be queued
-    from datetime import datetime, timezone
-    from uuid import uuid4
-
     incoming_kwargs = (dict(safe_request_get_json(request)) or {}) | kwargs
 
+    task = new_task(priority=priority, task_category=task_category, task_name=task_name, **incoming_kwargs)
+
+    try:
+        enqueue_tasks([task])
+
+    except Exception as ex:
+        reason = f'Failed to queue task {task_name} with error: {str(ex)}'
+
+    else:
+        reason = 'OK'
+
+    result = {
+        'success': reason == 'OK',
+        'reason': reason,
+        'result': task_receipt(task)
+    }
+
+    return safe_jsonify(
+        success=result['success'],
+        reason=result['reason'],
+        result=result['result'],
+        default={}
+    )
+
+
+def get_template_names() -> TemplateCatalog:
+    """
+    Returns the catalog of available templates. Membership is tested with (category, name) tuples, such as
+    ('reports', 'harvest.nodes').
+    """
+
+    return agent_directory.get_templates()
+
+
+def new_task(priority: int, task_category: str, task_name: str, **kwargs) -> dict:
+    """
+    Creates a task record ready to be enqueued.
+
+    Arguments
+    priority (int): The priority of the task. Lower numbers are higher priority.
+    task_category (str): The category of the task template. Typically, 'reports' or 'services'.
+    task_name (str): The name of the task template.
+    kwargs: The task configuration. A `parent` key links the task to a parent task.
+
+    Returns
+    dict: The task record.
+    """
+
     task_id = str(uuid4())
 
     task = {
@@ -383,61 +861,136 @@ def queue_task(priority: int, task_category: str, task_name: str, *args, **kwarg
         'priority': priority,
         'name': task_name,
         'status': 'enqueued',
-        'parent': incoming_kwargs.get('parent') or '',
+        'parent': kwargs.get('parent') or '',
         'category': f'template_{task_category}',
-        'config': incoming_kwargs | {'id': task_id},        # must include the task ID in the config otherwise it will not be passed
+        'config': kwargs | {'id': task_id},        # must include the task ID in the config otherwise it will not be passed
         'created': datetime.now(timezone.utc)
     }
 
     # Create a unique name for the task
-    redis_name = f"task:{task['parent']}:{task['id']}"
-    task['redis_name'] = redis_name
+    task['redis_name'] = f"task:{task['parent']}:{task['id']}"
+
+    return task
+
+
+def task_receipt(task: dict) -> dict:
+    """
+    Returns the fields of a task which are reported to the client once it has been queued.
+    """
+    return {
+        'redis_name': task['redis_name'],
+        'id': task['id'],
+        'parent': task['parent'],
+        'priority': task['priority'],
+        'created': task['created'],
+    }
+
+
+def enqueue_tasks(tasks, chunk_size: int = 500, fanout_name: str = None) -> int:
+    """
+    Writes tasks to the `harvest-tasks` silo and pushes them onto their priority queues. Tasks are written in chunks,
+    each chunk being a single MULTI/EXEC transaction, so a chunk is either queued entirely or not at all.
+
+    Arguments
+    tasks (Iterable[dict]): The tasks to enqueue, as returned by `new_task()`. May be a generator.
+    chunk_size (int, optional): The number of tasks written per round trip. Defaults to 500.
+    fanout_name (str, optional): The name of a fan-out hash whose `queued` counter is updated with each chunk.
+
+    Returns
+    int: The number of tasks enqueued.
+    """
 
     redis_request = RedisRequest(silo='harvest-tasks')
 
+    queued = 0
+    chunk = []
+
+    def write_chunk():
+        pipeline = redis_request.pipeline(transaction=True)
+
+        for task in chunk:
+            # Create the task queue item
+            pipeline.hset(name=task['redis_name'], mapping=format_hset(task))
+            pipeline.expire(name=task['redis_name'], time=TASK_EXPIRATION_SECONDS)
+
+            # Index the task so status and result lookups do not need to scan the keyspace
+            index_task(pipeline, task)
+
+            # Now add the task to the queue
+            pipeline.rpush(f"queue::{task['priority']}", task['redis_name'])
+
+        if fanout_name:
+            pipeline.hincrby(fanout_name, 'queued', len(chunk))
+            pipeline.hset(fanout_name, 'updated', time())
+
+        pipeline.execute()
+
+    for task in tasks:
+        chunk.append(task)
+
+        if len(chunk) >= chunk_size:
+            write_chunk()
+            queued += len(chunk)
+            chunk = []
+
+    if chunk:
+        write_chunk()
+        queued += len(chunk)
+
+    return queued
+
+
+def is_stale_fanout(fanout: dict) -> bool:
+    """
+    Returns True if a fan-out is still `enqueueing` but has not queued any tasks for FANOUT_STALE_SECONDS, meaning the
+    thread enqueueing its tasks is gone.
+    """
+
     try:
+        return time() - float(fanout.get('updated')) > FANOUT_STALE_SECONDS
 
-        # Create the task queue item
-        redis_request.hset(name=redis_name, mapping=format_hset(task))
-        redis_request.expire(name=redis_name, time=3600)
+    except (TypeError, ValueError):
+        return False
 
-        # Now add the task to the queue
-        redis_request.rpush(f"queue::{priority}", redis_name)
 
-    except Exception as ex:
-        reason = f'Failed to queue task {task_name} with error: {str(ex)}'
+def start_fanout(parent_id: str, tasks, total: int, chunk_size: int = 500):
+    """
+    Enqueues a large number of tasks in a background thread. Progress is recorded in the `task-fanout:{parent_id}`
+    hash, which reports the `total` number of tasks, the number `queued` so far, the fan-out `status`, and when it was
+    last `updated`.
 
-        # ROlLBACK
-        try:
-            redis_request.lrem(name=f"queue::{priority}", value=redis_name)
+    Arguments
+    parent_id (str): The ID of the parent task.
+    tasks (Iterable[dict]): The tasks to enqueue, as returned by `new_task()`. May be a generator.
+    total (int): The number of tasks which will be enqueued.
+    chunk_size (int, optional): The number of tasks written per round trip. Defaults to 500.
+
+    Returns
+    Thread: The thread enqueueing the tasks.
+    """
+
+    fanout_name = f'{TASK_FANOUT_PREFIX}:{parent_id}'
 
-        except Exception:
-            pass
+    redis_request = RedisRequest(silo='harvest-tasks')
+    redis_request.hset(name=fanout_name, mapping={'total': total, 'queued': 0, 'status': 'enqueueing', 'updated': time()})
+    redis_request.expire(name=fanout_name, time=TASK_EXPIRATION_SECONDS)
 
+    def _thread():
         try:
-            redis_request.delete(name=redis_name)
+            enqueue_tasks(tasks, chunk_size=chunk_size, fanout_name=fanout_name)
+            status = 'complete'
 
-        except Exception:
-            pass
+        except Exception as ex:
+            logger.error(f'[{parent_id}] Failed to enqueue tasks: {str(ex)}')
+            status = 'error'
 
-    else:
-        reason = 'OK'
+        try:
+            RedisRequest(silo='harvest-tasks').hset(name=fanout_name, key='status', value=status)
 
-    result = {
-        'success': reason == 'OK',
-        'reason': reason,
-        'result': {
-            'redis_name': redis_name,
-            'id': task['id'],
-            'parent': task['parent'],
-            'priority': task['priority'],
-            'created': task['created'],
-        }
-    }
+        except Exception as ex:
+            logger.error(f'[{parent_id}] Failed to record fan-out status: {str(ex)}')
 
-    return safe_jsonify(
-        success=result['success'],
-        reason=result['reason'],
-        result=result['result'],
-        default={}
-    )
+    thread = Thread(target=_thread, name=f'fanout-{parent_id}', daemon=True)
+    thread.start()
+
+    return thread
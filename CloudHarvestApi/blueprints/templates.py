@@ -0,0 +1,82 @@
+"""
+The task template catalog. Agents advertise the templates they can run as strings such as
+`template_services/aws.rds.instances`. The catalog parses them once so that the API can test whether a template exists
+and look templates up by category, platform, service, and type without re-parsing the list on every request.
+"""
+from typing import Iterable
+
+
+class TemplateCatalog:
+    """
+    An immutable, indexed collection of task templates.
+
+    Arguments
+    templates (Iterable[str]): Template identifiers formatted as `template_{category}/{name}`. Names are formatted as
+        `{platform}.{service}.{type}`; names with fewer parts are indexed by the parts they have.
+
+    Example:
+        >>> catalog = TemplateCatalog(['template_services/aws.rds.instances', 'template_reports/aws.regions'])
+        >>> ('services', 'aws.rds.instances') in catalog
+        True
+        >>> catalog.find(category='services', platform='aws')
+        ['aws.rds.instances']
+    """
+
+    def __init__(self, templates: Iterable[str] = ()):
+        self.templates = sorted(set(template for template in templates if template and '/' in template))
+
+        names = set()
+        index = {}
+
+        for template in self.templates:
+            category, name = template.split('/', 1)
+            category = category.replace('template_', '')
+
+            names.add((category, name))
+
+            # category -> platform -> service -> type -> name
+            platform, service, type_ = (name.split('.', 2) + [None, None])[:3]
+            index.setdefault(category, {}).setdefault(platform, {}).setdefault(service, {})[type_] = name
+
+        self.names = frozenset(names)
+        self.index = index
+
+    def __contains__(self, item: tuple) -> bool:
+        """
+        Returns True if a (category, name) tuple, such as ('services', 'aws.rds.instances'), is in the catalog.
+        """
+        return item in self.names
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def find(self, category: str = None, platform: str = None, service: str = None, type: str = None) -> list:
+        """
+        Returns the sorted names of the templates matching every provided key. Keys which are not provided match all
+        templates.
+
+        Arguments
+        category (str, optional): The template category, such as 'reports' or 'services'.
+        platform (str, optional): The platform, such as 'aws'.
+        service (str, optional): The service, such as 'rds'.
+        type (str, optional): The type, such as 'instances'.
+
+        Returns
+        list: The matching template names, such as ['aws.rds.instances'].
+        """
+
+        def select(level: dict, key: str) -> list:
+            if key is None:
+                return list(level.values())
+
+            return [level[key]] if key in level else []
+
+        results = set()
+
+        for platforms in select(self.index, category):
+            for services in select(platforms, platform):
+                for types in select(services, service):
+                    for name in select(types, type):
+                        results.add(name)
+
+        return sorted(results)
@@ -1,8 +1,8 @@
 from CloudHarvestCoreTasks.blueprints import HarvestApiBlueprint
-from flask import Response
+from flask import Response, request
 from logging import getLogger
 
-from CloudHarvestApi.blueprints.base import safe_jsonify
+from CloudHarvestApi.blueprints.base import safe_jsonify, safe_request_get_json
 from CloudHarvestApi.blueprints.home import not_implemented_error
 
 logger = getLogger('harvest')
@@ -12,22 +12,85 @@ users_blueprint = HarvestApiBlueprint(
     'users_bp', __name__
 )
 
+# The fields `users/list` may filter on. Each must be backed by an index on the `users` collection of the
+# `harvest-users` silo so that filtering never scans the collection.
+USER_FILTER_FIELDS = ('username',)
+
 @users_blueprint.route(rule='/list', methods=['GET'])
 def list_users() -> Response:
     """
-    Lists all users.
-    :return: A response.
+    Lists users one page at a time, ordered by `_id`.
+
+    Arguments (request JSON)
+    limit (int, optional): The maximum number of users to return. Defaults to 100, up to 1000.
+    token (str, optional): The continuation token returned by the previous page.
+    fields (list or str, optional): The fields to return for each user, such as ['username'] or 'username,email'.
+        Defaults to all fields.
+    filter (dict, optional): Field values the users must equal, such as {'username': 'jdoe'}. Only the indexed fields in
+        USER_FILTER_FIELDS may be filtered on, and only by equality.
+
+    :return: A response of
+    >>> {
+    >>>     'success': True,
+    >>>     'reason': 'OK',
+    >>>     'result': {
+    >>>         'users': [{...}, ...],
+    >>>         'token': 'eyJfaWQiOi...'      # None when there are no more users
+    >>>     }
+    >>> }
     """
     from CloudHarvestCoreTasks.silos import get_silo
-    silo = get_silo('harvest-users')
+
+    request_json = safe_request_get_json(request) or {}
 
     reason = 'OK'
-    result = []
+    users = []
+    token = None
+
     try:
+        limit = min(max(int(request_json.get('limit') or 100), 1), 1000)
+
+        filters = request_json.get('filter') or {}
+
+        unindexed = sorted(str(key) for key in filters.keys() if key not in USER_FILTER_FIELDS)
+        if unindexed:
+            raise ValueError(f'Users can only be filtered by {", ".join(USER_FILTER_FIELDS)}, not by '
+                             f'{", ".join(unindexed)}')
+
+        # Equality filters only; operators could be used to run arbitrary queries
+        operators = sorted(str(key) for key, value in filters.items() if isinstance(value, dict))
+        if operators:
+            raise ValueError(f'Users can only be filtered by equality, not by operators on {", ".join(operators)}')
+
+        query = dict(filters)
+
+        if request_json.get('token'):
+            query['_id'] = {'$gt': decode_page_token(request_json['token'])}
+
+        fields = request_json.get('fields')
+
+        if isinstance(fields, str):
+            fields = [field.strip() for field in fields.split(',') if field.strip()]
+
+        elif fields is not None and not isinstance(fields, list):
+            raise ValueError('fields must be a list or a comma-separated string')
+
+        projection = {str(field): 1 for field in fields} if fields else None
+
+        silo = get_silo('harvest-users')
+
         # Returns a MongoClient object
         client = silo.connect()
 
-        result = client[silo.database]['users'].find()
+        # One extra record is requested to learn whether another page exists
+        cursor = client[silo.database]['users'].find(query, projection=projection).sort('_id', 1).limit(limit + 1)
+
+        for user in cursor:
+            if len(users) == limit:
+                token = encode_page_token(users[-1]['_id'])
+                break
+
+            users.append(user)
 
     except Exception as ex:
         logger.error(f'Failed to list users with error: {str(ex)}')
@@ -35,10 +98,34 @@ def list_users() -> Response:
 
     return safe_jsonify(
         success=True if reason == 'OK' else False,
-        reason='OK',
-        result=list(result)
+        reason=reason,
+        result={
+            'users': users,
+            'token': token
+        }
     )
 
+
+def encode_page_token(last_id) -> str:
+    """
+    Encodes the `_id` of the last record on a page as an opaque continuation token.
+    """
+    from base64 import urlsafe_b64encode
+    from bson.json_util import dumps
+
+    return urlsafe_b64encode(dumps({'_id': last_id}).encode()).decode()
+
+
+def decode_page_token(token: str):
+    """
+    Decodes a continuation token created by `encode_page_token()` into the `_id` of the last record on the page.
+    """
+    from base64 import urlsafe_b64decode
+    from bson.json_util import loads
+
+    return loads(urlsafe_b64decode(token.encode()).decode())['_id']
+
+
 @users_blueprint.route(rule='/lookup_by_token/<token>', methods=['GET'])
 def lookup_user_by_token(token: str) -> Response:
     """
@@ -0,0 +1,47 @@
+"""
+Gunicorn configuration for the CloudHarvestApi. Server settings are read from the `api.server` section of `harvest.yaml`.
+Command line options passed to gunicorn, such as those set by the launcher, take precedence over these values.
+"""
+from CloudHarvestApi.startup import load_configuration_from_file
+from os import environ
+
+_server = (load_configuration_from_file().get('api') or {}).get('server') or {}
+
+# `sync` workers serve one request at a time. `gevent` workers serve many concurrent requests per process, so requests
+# which wait on agents (such as `tasks/await`) do not prevent the worker from serving other requests. The launcher's
+# --worker-class option is passed as HARVEST_API_WORKER_CLASS rather than `-k` so that `preload_app` below is decided
+# from the worker class which is actually used.
+worker_class = environ.get('HARVEST_API_WORKER_CLASS') or _server.get('worker_class') or 'sync'
+
+# The maximum number of simultaneous requests served by each gevent worker
+worker_connections = _server.get('worker_connections') or 1000
+
+# Workers which are silent for longer than this many seconds are restarted. For sync workers this must be longer than
+# the longest request, including awaits.
+timeout = _server.get('timeout') or 180
+
+# When enabled, the master loads the configuration, installs plugins, and registers the blueprints once before forking,
+# so workers start without repeating that work. Silo connections and background threads are started in each worker by
+# `post_fork`.
+#
+# gevent workers patch the standard library themselves once they are forked. A preloaded application would already
+# hold unpatched locks and events by then, and patching the master here would come after gunicorn has imported ssl and
+# threading, so gevent workers always load the application themselves.
+preload_app = bool(_server.get('preload')) and worker_class != 'gevent'
+
+if preload_app:
+    environ['CLOUDHARVESTAPI_PRELOAD'] = '1'
+
+
+def on_starting(server):
+    # A worker class given on the gunicorn command line is only known once this file has been read, so a preloaded
+    # application with gevent workers is refused here, before any worker is forked
+    if server.cfg.preload_app and 'gevent' in server.cfg.worker_class_str.lower():
+        raise RuntimeError('gevent workers cannot be used with a preloaded application; set api.server.preload to '
+                           'false or use sync workers')
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from CloudHarvestApi.__main__ import start_worker
+        start_worker()
@@ -0,0 +1,446 @@
+"""
+Load generator for an api node. Simulated clients run the task lifecycle against a running node: they queue a task,
+wait for it by polling `tasks/get_task_status` or by calling `tasks/await`, and pop its result with
+`tasks/get_task_result`, or let `tasks/await` pop it as it is returned. Readers request the listing endpoints in
+between. A fake agent completes the queued tasks by taking them from the `queue::{priority}` lists in the
+`harvest-tasks` silo, so no real agent is required. It only removes tasks for `LOADTEST_TEMPLATES` from the queues and
+leaves any other task in place, so it can run beside real agents.
+
+The tool reports the throughput, latency percentiles, and error rate of every endpoint and of the whole lifecycle.
+
+>>> python -m CloudHarvestApi.loadtest --url https://127.0.0.1:8000 --insecure --clients 50 --duration 60
+"""
+from argparse import ArgumentParser, Namespace
+from logging import getLogger
+from threading import Event, Lock, Thread
+from time import monotonic, perf_counter, sleep
+
+logger = getLogger('harvest')
+
+# The templates served by the fake agent
+LOADTEST_TEMPLATES = (
+    'aws.ec2.instances',
+    'aws.rds.instances',
+    'aws.s3.buckets',
+)
+
+# The number of entries at the head of each queue the fake agent inspects for load test tasks
+FAKE_AGENT_QUEUE_DEPTH = 100
+
+# The listing endpoints requested by readers
+READER_PATHS = (
+    '/pstar/list_platforms',
+    '/pstar/list_services',
+    '/pstar/list_accounts',
+    '/tasks/list_available_templates',
+    '/tasks/list_tasks',
+)
+
+
+class LoadStatistics:
+    """
+    Collects the latency and outcome of each request, by name.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, name: str, seconds: float, error: bool = False):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+            if error:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, elapsed: float) -> dict:
+        """
+        Returns the throughput, latency percentiles in milliseconds, and error rate of each request name.
+        """
+        def percentile(ordered: list, fraction: float) -> float:
+            return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+        report = {}
+
+        with self._lock:
+            for name, latencies in sorted(self.latencies.items()):
+                ordered = sorted(latencies)
+                errors = self.errors.get(name, 0)
+
+                report[name] = {
+                    'requests': len(ordered),
+                    'per_second': round(len(ordered) / elapsed, 2),
+                    'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+                    'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+                    'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+                    'max_ms': round(ordered[-1] * 1000, 2),
+                    'errors': errors,
+                    'error_rate': round(errors / len(ordered), 4),
+                }
+
+        return report
+
+
+class ApiClient:
+    """
+    A keep-alive connection to the api node. Each simulated client uses its own connection.
+
+    Arguments
+    url (str): The base url of the node, such as https://127.0.0.1:8000.
+    statistics (LoadStatistics): Where request latencies are recorded.
+    insecure (bool, optional): Skip verification of the node's certificate. Defaults to False.
+    timeout (float, optional): The socket timeout in seconds. Defaults to 180.
+    """
+
+    def __init__(self, url: str, statistics: LoadStatistics, insecure: bool = False, timeout: float = 180):
+        from urllib.parse import urlsplit
+
+        self.url = urlsplit(url)
+        self.statistics = statistics
+        self.insecure = insecure
+        self.timeout = timeout
+        self.connection = None
+
+    def _connect(self):
+        from http.client import HTTPConnection, HTTPSConnection
+        from ssl import create_default_context, CERT_NONE
+
+        if self.url.scheme == 'https':
+            context = create_default_context()
+
+            if self.insecure:
+                context.check_hostname = False
+                context.verify_mode = CERT_NONE
+
+            return HTTPSConnection(self.url.netloc, timeout=self.timeout, context=context)
+
+        return HTTPConnection(self.url.netloc, timeout=self.timeout)
+
+    def request(self, method: str, path: str, body: dict = None, name: str = None) -> dict or None:
+        """
+        Sends a request and records its latency under `name`, which defaults to the path. Requests which fail or return
+        `success: False` are recorded as errors.
+
+        Returns
+        dict or None: The decoded response, or None if the request failed.
+        """
+        from json import dumps, loads
+
+        name = name or path
+        start = perf_counter()
+
+        try:
+            if self.connection is None:
+                self.connection = self._connect()
+
+            self.connection.request(method, f'{self.url.path.rstrip("/")}{path}',
+                                    body=dumps(body) if body is not None else None,
+                                    headers={'Content-Type': 'application/json'})
+
+            response = self.connection.getresponse()
+            payload = loads(response.read() or b'{}')
+
+            error = response.status != 200 or payload.get('success') is False
+            self.statistics.record(name, perf_counter() - start, error=error)
+
+            return None if error else payload
+
+        except Exception as ex:
+            logger.debug('%s %s failed: %s', method, path, ex)
+            self.statistics.record(name, perf_counter() - start, error=True)
+
+            # The connection may be broken; the next request reconnects
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+            return None
+
+
+class FakeAgent:
+    """
+    Completes tasks from the `queue::{priority}` lists in place of a real agent. The agent registers itself in the
+    `harvest-nodes` silo so that the node accepts tasks for `LOADTEST_TEMPLATES`. Tasks for any other template are
+    left in their queue, in place, for the real agents.
+
+    Arguments
+    silos (dict): The `silos` configuration from `harvest.yaml`.
+    workers (int, optional): The number of tasks completed concurrently. Defaults to 4.
+    delay (float, optional): The number of seconds each task takes. Defaults to 0.1.
+    result_size (int, optional): The number of records in each task's result. Defaults to 100.
+    """
+
+    def __init__(self, silos: dict, workers: int = 4, delay: float = 0.1, result_size: int = 100):
+        from socket import gethostname
+
+        self.silos = silos
+        self.workers = workers
+        self.delay = delay
+        self.result_size = result_size
+        self.name = f'agent::loadtest:{gethostname()}'
+        self.stopped = Event()
+
+    def _client(self, silo_name: str):
+        from redis import StrictRedis
+
+        config = self.silos[silo_name]
+
+        return StrictRedis(host=config.get('host'), port=config.get('port'), password=config.get('password'),
+                           db=config.get('database'), decode_responses=True)
+
+    def start(self) -> list:
+        threads = [Thread(target=self._register, name='loadtest-agent-register', daemon=True)]
+        threads.extend(
+            Thread(target=self._work, name=f'loadtest-agent-{i}', daemon=True)
+            for i in range(self.workers)
+        )
+
+        for thread in threads:
+            thread.start()
+
+        return threads
+
+    def stop(self):
+        self.stopped.set()
+
+    def _register(self):
+        from json import dumps
+
+        nodes = self._client('harvest-nodes')
+
+        while not self.stopped.is_set():
+            nodes.hset(self.name, mapping={
+                'accounts': dumps(['aws:000000000000']),
+                'available_templates': dumps([f'template_services/{template}' for template in LOADTEST_TEMPLATES])
+            })
+            nodes.expire(self.name, 30)
+
+            self.stopped.wait(10)
+
+        nodes.delete(self.name)
+
+    def _work(self):
+        from datetime import datetime, timezone
+        from json import dumps
+        from CloudHarvestCoreTasks.tasks.redis import format_hset
+
+        tasks = self._client('harvest-tasks')
+        result = [dumps({'Id': i, 'Name': f'loadtest-{i}'}) for i in range(self.result_size)]
+        queues = []
+        next_scan = 0
+
+        while not self.stopped.is_set():
+            if monotonic() >= next_scan:
+                # Lower priority numbers are taken first
+                queues = sorted(tasks.scan_iter(match='queue::*', count=1000),
+                                key=lambda queue: int(queue.split('::', 1)[-1]) if queue.split('::', 1)[-1].isdigit() else 0)
+                next_scan = monotonic() + 1
+
+            if not queues:
+                self.stopped.wait(0.1)
+                continue
+
+            redis_name = self._claim(tasks, queues)
+
+            if redis_name is None:
+                self.stopped.wait(0.1)
+                continue
+
+            tasks.hset(redis_name, mapping=format_hset({'status': 'running',
+                                                        'start': datetime.now(timezone.utc)}))
+            sleep(self.delay)
+
+            # Like a real agent, the records are written to the task's `task-data:{task_id}` list before it is complete
+            data_name = f'task-data:{redis_name.rsplit(":", 1)[-1]}'
+            pipeline = tasks.pipeline(transaction=False)
+
+            if result:
+                pipeline.rpush(data_name, *result)
+                pipeline.expire(data_name, 3600)
+
+            pipeline.hset(redis_name, mapping=format_hset({'status': 'complete',
+                                                           'end': datetime.now(timezone.utc)}))
+            pipeline.execute()
+
+    @staticmethod
+    def _claim(tasks, queues: list) -> str or None:
+        """
+        Removes the first load test task from the queues and returns its Redis name, or None if no queue holds one.
+        Entries are inspected in place and only load test tasks are removed, so other agents' tasks keep their place in
+        their queues.
+        """
+        for queue in queues:
+            entries = tasks.lrange(queue, 0, FAKE_AGENT_QUEUE_DEPTH - 1)
+
+            if not entries:
+                continue
+
+            pipeline = tasks.pipeline(transaction=False)
+            for redis_name in entries:
+                pipeline.hget(redis_name, 'name')
+
+            for redis_name, name in zip(entries, pipeline.execute()):
+                # LREM only succeeds for one worker, so each task is claimed once
+                if name in LOADTEST_TEMPLATES and tasks.lrem(queue, 1, redis_name):
+                    return redis_name
+
+        return None
+
+
+def run_client(client: ApiClient, args: Namespace, stop: Event, use_await: bool):
+    """
+    Runs the task lifecycle until `stop` is set: queue a task, wait for it to complete, then pop its result.
+    """
+    from random import choice
+
+    while not stop.is_set():
+        start = perf_counter()
+
+        receipt = client.request('POST', f'/tasks/queue/{args.priority}/services/{choice(LOADTEST_TEMPLATES)}',
+                                 body={}, name='/tasks/queue')
+
+        if receipt is None:
+            client.statistics.record('lifecycle', perf_counter() - start, error=True)
+            stop.wait(args.poll_interval)
+            continue
+
+        task_id = receipt['result']['id']
+        deadline = monotonic() + args.task_timeout
+        complete = False
+
+        if use_await:
+            # tasks/await returns the result once the task is complete, so it is popped there instead of downloaded twice
+            response = client.request('GET', f'/tasks/await/{task_id}', body={'timeout': args.task_timeout, 'pop': True},
+                                      name='/tasks/await')
+            complete = bool(response) and (response.get('result') or {}).get('status') == 'complete'
+
+        else:
+            while not stop.is_set() and monotonic() < deadline:
+                response = client.request('GET', f'/tasks/get_task_status/{task_id}', name='/tasks/get_task_status')
+                status = ((response or {}).get('result') or {}).get('status')
+
+                if status == 'complete':
+                    complete = True
+                    break
+
+                if status == 'error':
+                    break
+
+                stop.wait(args.poll_interval)
+
+            if complete:
+                complete = client.request('GET', f'/tasks/get_task_result/{task_id}', body={'pop': True},
+                                          name='/tasks/get_task_result') is not None
+
+        if complete or not stop.is_set():
+            client.statistics.record('lifecycle', perf_counter() - start, error=not complete)
+
+
+def run_reader(client: ApiClient, args: Namespace, stop: Event):
+    """
+    Requests the listing endpoints until `stop` is set.
+    """
+    from random import choice
+
+    while not stop.is_set():
+        client.request('GET', choice(READER_PATHS))
+        stop.wait(args.reader_interval)
+
+
+def format_report(report: dict) -> str:
+    header = f'{"request":<34}{"count":>8}{"per sec":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}{"errors":>8}{"error %":>9}'
+
+    lines = [header, '-' * len(header)]
+
+    for name, result in report.items():
+        lines.append(f'{name:<34}{result["requests"]:>8}{result["per_second"]:>10}{result["p50_ms"]:>10}'
+                     f'{result["p95_ms"]:>10}{result["p99_ms"]:>10}{result["max_ms"]:>10}{result["errors"]:>8}'
+                     f'{result["error_rate"] * 100:>9.2f}')
+
+    return '\n'.join(lines)
+
+
+def main():
+    parser = ArgumentParser(description='Generates task lifecycle load against a running CloudHarvestApi node.')
+    parser.add_argument('--url', type=str, default='https://127.0.0.1:8000', help='Base url of the api node')
+    parser.add_argument('--insecure', action='store_true', help='Do not verify the node\'s certificate')
+    parser.add_argument('--clients', type=int, default=10, help='Concurrent clients running the task lifecycle')
+    parser.add_argument('--await-ratio', type=float, default=0.5,
+                        help='Fraction of clients which use tasks/await instead of polling get_task_status')
+    parser.add_argument('--readers', type=int, default=2, help='Concurrent clients requesting the listing endpoints')
+    parser.add_argument('--reader-interval', type=float, default=0.1, help='Seconds between a reader\'s requests')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to generate load for')
+    parser.add_argument('--priority', type=int, default=5, help='Priority of the queued tasks')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='Seconds between status polls')
+    parser.add_argument('--task-timeout', type=float, default=60, help='Seconds to wait for each task')
+    parser.add_argument('--agent-workers', type=int, default=4,
+                        help='Tasks the fake agent completes concurrently; 0 to rely on real agents')
+    parser.add_argument('--agent-delay', type=float, default=0.1, help='Seconds the fake agent takes per task')
+    parser.add_argument('--result-size', type=int, default=100, help='Records in each fake task result')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    args = parser.parse_args()
+
+    statistics = LoadStatistics()
+    stop = Event()
+
+    agent = None
+    if args.agent_workers > 0:
+        from CloudHarvestApi.startup import load_configuration_from_file
+
+        agent = FakeAgent(silos=load_configuration_from_file().get('silos') or {},
+                          workers=args.agent_workers,
+                          delay=args.agent_delay,
+                          result_size=args.result_size)
+        agent.start()
+
+        # Gives the node time to see the fake agent's templates
+        sleep(1)
+
+    await_clients = int(round(args.clients * args.await_ratio))
+
+    threads = [
+        Thread(target=run_client, args=(ApiClient(args.url, statistics, args.insecure), args, stop, i < await_clients),
+               name=f'loadtest-client-{i}', daemon=True)
+        for i in range(args.clients)
+    ] + [
+        Thread(target=run_reader, args=(ApiClient(args.url, statistics, args.insecure), args, stop),
+               name=f'loadtest-reader-{i}', daemon=True)
+        for i in range(args.readers)
+    ]
+
+    start = monotonic()
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        stop.wait(args.duration)
+
+    except KeyboardInterrupt:
+        pass
+
+    stop.set()
+    elapsed = monotonic() - start
+
+    # Clients finish their current request; those waiting on a task are not waited for
+    for thread in threads:
+        thread.join(timeout=args.poll_interval + 5)
+
+    if agent:
+        agent.stop()
+
+    report = statistics.report(elapsed)
+
+    if args.json:
+        from json import dumps
+        print(dumps(report, indent=2))
+
+    else:
+        print(f'{args.clients} clients ({await_clients} awaiting), {args.readers} readers, {elapsed:.1f}s')
+        print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()
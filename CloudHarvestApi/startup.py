@@ -1,6 +1,68 @@
 from CloudHarvestCoreTasks.dataset import WalkableDict
 
-from logging import Logger
+from contextlib import contextmanager
+from logging import Handler, Logger
+from time import perf_counter
+
+
+class StartupProfiler:
+    """
+    Records how long each phase of startup takes and how many modules were imported during it. When enabled, the
+    report is logged at INFO; otherwise it is logged at DEBUG. Profiling is enabled by setting the
+    `CLOUDHARVESTAPI_PROFILE_STARTUP` environment variable, since the configuration file has not been read when the first
+    phases run.
+
+    >>> profiler = StartupProfiler()
+    >>> with profiler.phase('config'):
+    >>>     ...
+    >>> profiler.report()
+    'config: 0.012s (3 modules)'
+    """
+
+    def __init__(self, enabled: bool = None):
+        from os import environ
+
+        self.enabled = bool(environ.get('CLOUDHARVESTAPI_PROFILE_STARTUP')) if enabled is None else enabled
+        self.started = perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Times the enclosed block as the startup phase `name`.
+        """
+        from sys import modules
+
+        module_count = len(modules)
+        start = perf_counter()
+
+        try:
+            yield
+
+        finally:
+            self.phases.append((name, perf_counter() - start, len(modules) - module_count))
+
+    def report(self) -> str:
+        """
+        Returns one line per phase followed by the total time since the profiler was created.
+        """
+        lines = [
+            f'{name}: {seconds:.3f}s ({module_count} modules)'
+            for name, seconds, module_count in self.phases
+        ]
+
+        lines.append(f'total: {perf_counter() - self.started:.3f}s')
+
+        return '\n'.join(lines)
+
+    def log(self, logger: Logger):
+        """
+        Logs the report, at INFO when profiling is enabled and DEBUG otherwise.
+        """
+        from logging import DEBUG, INFO
+
+        logger.log(INFO if self.enabled else DEBUG, 'Startup profile:\n%s', self.report())
+
 
 def flatten_dict_preserve_lists(d, parent_key='', sep='.') -> dict:
     """
@@ -33,6 +95,12 @@ def start_node_heartbeat(config: WalkableDict):
     Start the heartbeat process on the harvest-nodes silo. This process will update the node status in the Redis
     cache at regular intervals.
 
+    Every worker process starts a heartbeat thread, but only the worker holding the node's local lock file writes to
+    Redis, so each node reports a single heartbeat. If that worker exits, the lock is released and another worker takes
+    over. Workers share their own statistics with the heartbeat through small files next to the lock, which are
+    reported in the `workers` field. After the first beat, only the fields which changed are written, together with
+    the expiration, in a single round trip. If the record expired in the meantime, it is written again in full.
+
     Args:
     config (WalkableDict): The configuration for the node heartbeat process.
 
@@ -53,21 +121,99 @@ def start_node_heartbeat(config: WalkableDict):
 
     import platform
 
-    from CloudHarvestCoreTasks.silos import get_silo
+    from CloudHarvestApi.blueprints.base import RedisRequest
     from datetime import datetime, timezone
+    from fcntl import flock, LOCK_EX, LOCK_NB
+    from json import dumps, loads
     from logging import getLogger
+    from os import getpid, kill, makedirs, remove, replace
+    from os.path import join
+    from resource import getrusage, RUSAGE_SELF
     from socket import getfqdn, gethostbyname
+    from tempfile import gettempdir
     from time import sleep
     from threading import Thread
 
     logger = getLogger('harvest')
 
+    # Workers of the same node share a lock and a statistics directory, keyed by port so that several nodes may run on
+    # the same host
+    port = config.walk('api.connection.port')
+    heartbeat_directory = config.walk('api.heartbeat.directory') or join(gettempdir(), f'cloudharvestapi-{port}')
+    workers_directory = join(heartbeat_directory, 'workers')
+    makedirs(workers_directory, exist_ok=True)
+
+    expiration_seconds = int(expiration_multiplier * heartbeat_check_rate)
+
+    def format_for_redis(dictionary: dict) -> dict:
+        """
+        Format the dictionary for Redis HSET. This method converts all non-string, non-integer, and non-float
+        values to JSON strings. This is necessary because Redis supports a limited array of data types.
+        Args:
+            dictionary (dict): The dictionary to format.
+
+        Returns:
+            dict: The formatted dictionary.
+        """
+
+        # Format the records
+        for key, value in dictionary.items():
+            if not isinstance(value, (str, int, float)):
+                dictionary[key] = dumps(value, default=str)
+
+        return dictionary
+
+    def write_worker_stats(pid: int, start: datetime):
+        """
+        Records this worker's statistics for the node's heartbeat.
+        """
+        filename = join(workers_directory, f'{pid}.json')
+
+        with open(f'{filename}.tmp', 'w') as stats_file:
+            stats_file.write(dumps({
+                'pid': pid,
+                'start': start.isoformat(),
+                'max_rss_kb': getrusage(RUSAGE_SELF).ru_maxrss
+            }))
+
+        # Readers never see a partially written file
+        replace(f'{filename}.tmp', filename)
+
+    def read_worker_stats() -> list:
+        """
+        Returns the statistics of the node's live workers, removing those of workers which have exited.
+        """
+        from os import listdir
+
+        workers = []
+        for filename in sorted(listdir(workers_directory)):
+            if not filename.endswith('.json'):
+                continue
+
+            try:
+                pid = int(filename.split('.')[0])
+                kill(pid, 0)
+
+                with open(join(workers_directory, filename)) as stats_file:
+                    workers.append(loads(stats_file.read()))
+
+            except (ProcessLookupError, ValueError):
+                try:
+                    remove(join(workers_directory, filename))
+
+                except OSError:
+                    pass
+
+            except Exception:
+                continue
+
+        return workers
+
     def _thread():
         start_datetime = datetime.now(tz=timezone.utc)
+        pid = getpid()
 
-        # Get the Redis client
-        silo = get_silo('harvest-nodes')
-        client = silo.connect()     # A StrictRedis instance
+        redis_request = RedisRequest('harvest-nodes')
 
         # Get the application metadata
         import tomli
@@ -83,64 +229,149 @@ def start_node_heartbeat(config: WalkableDict):
                 "heartbeat_seconds": heartbeat_check_rate,
                 "name": node_name,
                 "os": platform.freedesktop_os_release().get('PRETTY_NAME'),
-                "pid": config.walk('api.pid'),
                 "plugins": config.get('plugins', []),
-                "port": config.walk('api.connection.port'),
+                "port": port,
                 "python": platform.python_version(),
                 "role": node_role,
-                "start": start_datetime.isoformat(),
                 "version": app_metadata.get('version')
             }
 
         node_record_identifier = config.walk('api.name')
 
-        def format_for_redis(dictionary: dict) -> dict:
-            """
-            Format the dictionary for Redis HSET. This method converts all non-string, non-integer, and non-float
-            values to JSON strings. This is necessary because Redis supports a limited array of data types.
-            Args:
-                dictionary (dict): The dictionary to format.
+        lock_file = open(join(heartbeat_directory, 'heartbeat.lock'), 'a+')
+        is_leader = False
+        previous = {}
+
+        while True:
+            last_datetime = datetime.now(tz=timezone.utc)
+
+            try:
+                write_worker_stats(pid, start_datetime)
 
-            Returns:
-                dict: The formatted dictionary.
-            """
+            except Exception as e:
+                logger.debug(f'heartbeat: Could not record worker statistics: {e.args}')
+
+            if not is_leader:
+                try:
+                    flock(lock_file, LOCK_EX | LOCK_NB)
+                    is_leader = True
+                    previous = {}
+
+                    logger.info(f'heartbeat: worker {pid} is reporting the heartbeat for {node_record_identifier}')
+
+                except BlockingIOError:
+                    pass
+
+            if is_leader:
+                # Update the last heartbeat time
+                current = format_for_redis(node_info | {
+                    'pid': pid,
+                    'start': start_datetime.isoformat(),
+                    'last': last_datetime.isoformat(),
+                    'duration': (last_datetime - start_datetime).total_seconds(),
+                    'workers': read_worker_stats()
+                })
+
+                # Only the fields which changed since the last successful beat are written
+                changes = {
+                    key: value
+                    for key, value in current.items()
+                    if previous.get(key) != value
+                }
+
+                # Update the node status in the Redis cache
+                try:
+                    pipeline = redis_request.pipeline(transaction=False)
+                    pipeline.hset(node_record_identifier, mapping=changes)
+
+                    # Set the expiration time for the node record
+                    pipeline.expire(node_record_identifier, expiration_seconds)
+                    created_fields, _ = pipeline.execute()
+
+                    # Changed fields are only new when the record had expired, such as after a stalled worker, so the
+                    # whole record is written again
+                    if previous and created_fields:
+                        logger.warning(f'heartbeat: node record {node_record_identifier} had expired, rewriting it')
+                        pipeline.hset(node_record_identifier, mapping=current)
+                        pipeline.expire(node_record_identifier, expiration_seconds)
+                        pipeline.execute()
+
+                    previous = current
+
+                    logger.debug(f'heartbeat: OK')
+
+                except Exception as e:
+                    # The next beat writes the whole record in case the node record has expired
+                    previous = {}
+                    logger.error(f'heartbeat: Could not update silo `harvest-nodes`: {e.args}')
 
-            # Format the records
-            import json
-            for key, value in dictionary.items():
-                if not isinstance(value, (str, int, float)):
-                    dictionary[key] = json.dumps(value, default=str)
+            sleep(heartbeat_check_rate)
 
-            return dictionary
+    # Start the heartbeat thread
+    thread = Thread(target=_thread, name='harvest-heartbeat', daemon=True)
+    thread.start()
 
-        # Record the information to Redis
-        client.hset(node_record_identifier, mapping=format_for_redis(node_info))
+    return thread
+
+def start_regions_warmer(config: WalkableDict):
+    """
+    Start the background process which keeps the platform regions catalog in the harvest-core silo up to date. Every
+    worker starts the warmer, but only the worker holding the node's `regions.lock` file warms the catalog, so each node
+    warms it once. A refresh lease stored with each platform ensures only one node asks an agent for a platform's
+    regions at a time.
+
+    Args:
+    config (WalkableDict): The configuration for the regions warmer.
+
+    Returns: The thread object that is running the regions warmer.
+    """
+
+    from CloudHarvestApi.blueprints.regions import regions_catalog
+    from fcntl import flock, LOCK_EX, LOCK_NB
+    from logging import getLogger
+    from os import getpid, makedirs
+    from os.path import join
+    from tempfile import gettempdir
+    from time import sleep
+    from threading import Thread
+
+    logger = getLogger('harvest')
+
+    check_rate = config.walk('api.regions.check_rate') or 60
+    regions_catalog.refresh_seconds = config.walk('api.regions.refresh_seconds') or 3600
+    regions_catalog.timeout = config.walk('api.regions.timeout') or 120
+
+    # The lock is kept next to the heartbeat's, which is keyed by port so that several nodes may run on the same host
+    port = config.walk('api.connection.port')
+    heartbeat_directory = config.walk('api.heartbeat.directory') or join(gettempdir(), f'cloudharvestapi-{port}')
+    makedirs(heartbeat_directory, exist_ok=True)
+
+    def _thread():
+        lock_file = open(join(heartbeat_directory, 'regions.lock'), 'a+')
+        is_warmer = False
 
         while True:
-            # Update the last heartbeat time
-            last_datetime = datetime.now(tz=timezone.utc)
-            node_info |= {
-                'last': last_datetime.isoformat(),
-                'duration': (last_datetime - start_datetime).total_seconds()
-            }
+            if not is_warmer:
+                try:
+                    flock(lock_file, LOCK_EX | LOCK_NB)
+                    is_warmer = True
 
-            # Update the node status in the Redis cache
-            try:
-                # Record the information to Redis
-                client.hset(node_record_identifier, mapping=format_for_redis(node_info))
+                    logger.info(f'regions: worker {getpid()} is warming the regions catalog')
 
-                # Set the expiration time for the node record
-                client.expire(node_record_identifier, int(expiration_multiplier * heartbeat_check_rate))
+                except BlockingIOError:
+                    sleep(check_rate)
+                    continue
 
-                logger.debug(f'heartbeat: OK')
+            try:
+                regions_catalog.warm()
 
             except Exception as e:
-                logger.error(f'heartbeat: Could not update silo `harvest-nodes`: {e.args}')
+                logger.error(f'regions: Could not warm the regions catalog: {e.args}')
 
-            sleep(heartbeat_check_rate)
+            sleep(check_rate)
 
-    # Start the heartbeat thread
-    thread = Thread(target=_thread, daemon=True)
+    # Start the regions warmer thread
+    thread = Thread(target=_thread, name='harvest-regions-warmer', daemon=True)
     thread.start()
 
     return thread
@@ -180,10 +411,376 @@ def load_configuration_from_file() -> dict:
     }
 
 
+def install_plugins_once(plugins_config: dict or list, quiet: bool = False, state_directory: str = None) -> bool:
+    """
+    Installs the configured plugins unless the same plugin configuration has already been installed on this host.
+    Installation is keyed by a hash of the plugin configuration and guarded by a lock file, so that only one process
+    installs plugins at a time and the others wait for it rather than racing on site-packages.
+
+    Arguments
+    plugins_config (dict or list): The `plugins` configuration.
+    quiet (bool, optional): Whether to suppress installer output. Defaults to False.
+    state_directory (str, optional): Where the lock and configuration hash are kept. Defaults to the Python environment
+        (`sys.prefix`) the plugins are installed into.
+
+    Returns
+    bool: True if the plugins were installed, False if the installed plugins were already up to date.
+    """
+
+    from CloudHarvestCorePluginManager.plugins import generate_plugins_file, install_plugins
+    from fcntl import flock, LOCK_EX, LOCK_UN
+    from hashlib import sha256
+    from json import dumps
+    from logging import getLogger
+    from os.path import exists, join
+    from sys import prefix
+
+    logger = getLogger('harvest')
+
+    state_directory = state_directory or prefix
+    hash_path = join(state_directory, '.cloudharvestapi-plugins.sha256')
+
+    config_hash = sha256(dumps(plugins_config or {}, sort_keys=True, default=str).encode()).hexdigest()
+
+    with open(join(state_directory, '.cloudharvestapi-plugins.lock'), 'a+') as lock_file:
+        # Blocks until any other process installing plugins has finished
+        flock(lock_file, LOCK_EX)
+
+        try:
+            if exists(hash_path):
+                with open(hash_path) as hash_file:
+                    if hash_file.read().strip() == config_hash:
+                        logger.debug('Plugins are up to date.')
+                        return False
+
+            generate_plugins_file(plugins_config or {})
+            install_plugins(quiet=quiet)
+
+            with open(hash_path, 'w') as hash_file:
+                hash_file.write(config_hash)
+
+            return True
+
+        finally:
+            flock(lock_file, LOCK_UN)
+
+
+class HostLogHandler(Handler):
+    """
+    Writes the api log for every process on the host through a single writer, so gunicorn workers never rotate the same
+    file at once.
+
+    The first process to take the lock on `api.log.lock` writes `api.log` and accepts records from the other processes
+    over the Unix socket `api.log.sock`. Every other process forwards its records to that socket as JSON lines. When the
+    writer exits, the next process to log takes over. While no writer can be reached, records are buffered and sent, in
+    order, once one can be; only when more than `buffer_size` records are waiting are the oldest dropped.
+
+    Arguments
+    location (str): The directory containing the log file.
+    max_bytes (int, optional): The size at which the log file is rotated. Defaults to 10000000.
+    backup_count (int, optional): The number of rotated log files to keep. Defaults to 5.
+    check_rate (float, optional): How often, in seconds, a forwarding process tries to take over as the writer or, when
+        it cannot reach the writer, to reconnect to it. Defaults to 5.
+    lead (bool, optional): Whether this process may become the writer. A gunicorn master which preloads the application
+        passes False so that the writer is always a worker; its forked children may lead. Defaults to True.
+    buffer_size (int, optional): The maximum number of records kept while no writer can be reached. Defaults to 10000.
+    """
+
+    # The record attributes sent to the writer; the message is sent already formatted with its arguments
+    FORWARDED_ATTRIBUTES = ('name', 'levelno', 'levelname', 'pathname', 'filename', 'module', 'lineno', 'funcName',
+                            'created', 'msecs', 'relativeCreated', 'thread', 'threadName', 'process', 'processName',
+                            'exc_text', 'stack_info')
+
+    def __init__(self, location: str, max_bytes: int = 10000000, backup_count: int = 5, check_rate: float = 5,
+                 lead: bool = True, buffer_size: int = 10000):
+        from collections import deque
+        from os import register_at_fork
+        from os.path import join
+
+        super().__init__()
+
+        self.path = join(location, 'api.log')
+        self.lock_path = join(location, 'api.log.lock')
+        self.socket_path = join(location, 'api.log.sock')
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.check_rate = check_rate
+
+        self.file_handler = None
+        self.lock_file = None
+        self.server = None
+        self.sock = None
+        self.next_check = 0
+        self.next_connect = 0
+        self.can_lead = lead
+
+        self.buffer = deque(maxlen=buffer_size)
+        self.flusher_pid = None
+
+        self._lead()
+
+        # A forked child inherits the writer's lock but not its server thread, so it starts out forwarding
+        register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        if self.lock_file:
+            # Closing the inherited descriptor does not release the parent's lock
+            self.lock_file.close()
+
+        if self.sock:
+            self.sock.close()
+
+        self.file_handler = None
+        self.lock_file = None
+        self.server = None
+        self.sock = None
+        self.next_check = 0
+        self.next_connect = 0
+        self.can_lead = True
+
+        # The parent's buffered records are its own to send
+        self.buffer.clear()
+        self.flusher_pid = None
+
+    def _lead(self) -> bool:
+        """
+        Becomes the host's writer if no other process is. Returns True if this process is the writer.
+        """
+        from fcntl import flock, LOCK_EX, LOCK_NB
+        from logging.handlers import RotatingFileHandler
+        from os import remove
+        from os.path import exists
+        from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+        from threading import Thread
+        from time import monotonic
+
+        self.next_check = monotonic() + self.check_rate
+
+        if not self.can_lead:
+            return False
+
+        lock_file = open(self.lock_path, 'a')
+
+        try:
+            flock(lock_file, LOCK_EX | LOCK_NB)
+
+        except OSError:
+            lock_file.close()
+            return False
+
+        self.lock_file = lock_file
+        self.file_handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backup_count)
+        self.file_handler.setFormatter(self.formatter)
+
+        file_handler = self.file_handler
+        decode = self._decode
+
+        class ForwardedRecordHandler(StreamRequestHandler):
+            def handle(self):
+                # Each record is one line of JSON; lines which cannot be decoded are skipped
+                for line in self.rfile:
+                    record = decode(line)
+
+                    if record is not None:
+                        file_handler.handle(record)
+
+        try:
+            # The socket of a previous writer is left behind when it exits
+            if exists(self.socket_path):
+                remove(self.socket_path)
+
+            self.server = ThreadingUnixStreamServer(self.socket_path, ForwardedRecordHandler)
+            self.server.daemon_threads = True
+
+            Thread(target=self.server.serve_forever, name='log-writer', daemon=True).start()
+
+        except OSError as ex:
+            # Without the socket this process still writes its own records
+            self.file_handler.handle(self._error_record(f'Could not accept log records from other processes: {ex}'))
+
+        # Records buffered while no writer could be reached are written now
+        while self.buffer:
+            record = self._decode(self.buffer.popleft())
+
+            if record is not None:
+                self.file_handler.handle(record)
+
+        return True
+
+    def _error_record(self, message: str):
+        from logging import LogRecord, ERROR
+
+        return LogRecord('harvest', ERROR, __file__, 0, message, None, None)
+
+    def _encode(self, record) -> bytes:
+        """
+        Encodes a record as a line of JSON.
+        """
+        from json import dumps
+        from logging import Formatter
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = Formatter().formatException(record.exc_info)
+
+        attributes = {attribute: getattr(record, attribute, None) for attribute in self.FORWARDED_ATTRIBUTES}
+        attributes['msg'] = record.getMessage()
+
+        return (dumps(attributes, default=str) + '\n').encode()
+
+    @staticmethod
+    def _decode(line: bytes):
+        """
+        Decodes a line written by `_encode` into a record, or returns None if the line is not a record.
+        """
+        from json import loads
+        from logging import makeLogRecord
+
+        try:
+            attributes = loads(line)
+
+        except ValueError:
+            return None
+
+        if not isinstance(attributes, dict):
+            return None
+
+        # Only plain values are accepted; the message was formatted by the sender
+        return makeLogRecord({
+            key: value
+            for key, value in attributes.items()
+            if key in HostLogHandler.FORWARDED_ATTRIBUTES or key == 'msg'
+        })
+
+    def _send(self, data: bytes) -> bool:
+        """
+        Sends an encoded record to the writer. After a failure, the writer is not contacted again for `check_rate`
+        seconds. Returns True if the record was sent.
+        """
+        from socket import socket, AF_UNIX, SOCK_STREAM
+        from time import monotonic
+
+        if self.sock is None:
+            if monotonic() < self.next_connect:
+                return False
+
+            sock = socket(AF_UNIX, SOCK_STREAM)
+
+            try:
+                sock.connect(self.socket_path)
+
+            except OSError:
+                sock.close()
+                self.next_connect = monotonic() + self.check_rate
+                return False
+
+            self.sock = sock
+
+        try:
+            self.sock.sendall(data)
+            return True
+
+        except OSError:
+            self.sock.close()
+            self.sock = None
+            self.next_connect = monotonic() + self.check_rate
+            return False
+
+    def _flush(self) -> bool:
+        """
+        Sends the buffered records, oldest first. Returns True once the buffer is empty.
+        """
+        while self.buffer:
+            if not self._send(self.buffer[0]):
+                return False
+
+            self.buffer.popleft()
+
+        return True
+
+    def _start_flusher(self):
+        """
+        Starts a thread which delivers the buffered records once the writer can be reached, even if this process logs
+        nothing else, as a gunicorn master rarely does.
+        """
+        from os import getpid
+        from threading import Thread
+        from time import monotonic, sleep
+
+        if self.flusher_pid == getpid():
+            return
+
+        self.flusher_pid = pid = getpid()
+
+        def _thread():
+            while True:
+                sleep(self.check_rate)
+
+                with self.lock:
+                    if self.flusher_pid != pid:
+                        return
+
+                    # Taking over as the writer also writes the buffered records
+                    if self.file_handler is None and monotonic() >= self.next_check:
+                        self._lead()
+
+                    if self.file_handler is None:
+                        self._flush()
+
+                    if not self.buffer:
+                        self.flusher_pid = None
+                        return
+
+        Thread(target=_thread, name='log-flusher', daemon=True).start()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+
+        if self.file_handler:
+            self.file_handler.setFormatter(fmt)
+
+    def emit(self, record):
+        from time import monotonic
+
+        try:
+            if self.file_handler is None and monotonic() >= self.next_check:
+                self._lead()
+
+            if self.file_handler is not None:
+                self.file_handler.handle(record)
+                return
+
+            self.buffer.append(self._encode(record))
+
+            # Until the writer can be reached, or this process takes over from it, the flusher retries every
+            # `check_rate` seconds
+            if not self._flush():
+                self._start_flusher()
+
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+        if self.file_handler:
+            self.file_handler.close()
+
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+        super().close()
+
+
 def load_logging(log_destination: str = './app/logs/', log_level: str = 'info', quiet: bool = False, **kwargs) -> Logger:
     """
     This method configures logging for the api.
 
+    Records are placed on an in-memory queue and written by a background thread, so requests never wait on the log
+    file or the console. The log file is written by one process per host; see `HostLogHandler`.
+
     Arguments
     log_destination (str, optional): The destination directory for the log file. Defaults to './app/logs/'.
     log_level (str, optional): The logging level. Defaults to 'info'.
@@ -192,7 +789,7 @@ def load_logging(log_destination: str = './app/logs/', log_level: str = 'info',
     level = log_level
 
     from logging import getLogger, Formatter, StreamHandler, DEBUG
-    from logging.handlers import RotatingFileHandler
+    from logging.handlers import QueueHandler
 
     # Redirect Flask's HTTP console output
     werkzeug_logger = getLogger('werkzeug')
@@ -202,11 +799,12 @@ def load_logging(log_destination: str = './app/logs/', log_level: str = 'info',
     new_logger = getLogger(name='harvest')
 
     # If the logger exists, remove all of its existing handlers
-    if new_logger.hasHandlers():
-        [
-            new_logger.removeHandler(handler)
-            for handler in new_logger.handlers
-        ]
+    for existing_logger in (new_logger, werkzeug_logger):
+        for handler in list(existing_logger.handlers):
+            existing_logger.removeHandler(handler)
+
+    for handler in stop_log_listener():
+        handler.close()
 
     from importlib import import_module
     lm = import_module('logging')
@@ -223,69 +821,237 @@ def load_logging(log_destination: str = './app/logs/', log_level: str = 'info',
     # make the destination log directory if it does not already exist
     Path(_location).mkdir(parents=True, exist_ok=True)
 
-    # configure the file handler
-    from os.path import join
-    fh = RotatingFileHandler(join(_location, 'api.log'), maxBytes=10000000, backupCount=5)
+    # configure the file handler; a preloading gunicorn master leaves writing the file to its workers
+    from os import environ
+    fh = HostLogHandler(_location, lead=not environ.get('CLOUDHARVESTAPI_PRELOAD'))
     fh.setFormatter(fmt=log_format)
     fh.setLevel(DEBUG)
 
-    new_logger.addHandler(fh)
-    werkzeug_logger.addHandler(fh)
+    handlers = [fh]
 
     if not quiet:
         # stream handler
         sh = StreamHandler()
         sh.setFormatter(fmt=log_format)
         sh.setLevel(log_level_attribute)
-        new_logger.addHandler(sh)
-        werkzeug_logger.addHandler(sh)
+        handlers.append(sh)
+
+    qh = QueueHandler(start_log_listener(handlers))
+
+    new_logger.addHandler(qh)
+    werkzeug_logger.addHandler(qh)
 
     new_logger.setLevel(log_level_attribute)
 
-    new_logger.debug(f'Logging enabled successfully. Log location: {log_destination}')
+    new_logger.debug('Logging enabled successfully. Log location: %s', log_destination)
 
     return new_logger
 
 
-def load_silos(silo_config: dict) -> dict:
+# The queue and listener which write the records of this process
+LOG_LISTENER = {}
+
+
+def start_log_listener(handlers: list):
     """
-    This method loads the silos from the configuration.
+    Starts a background thread which passes queued records to `handlers`. The thread is started again in each forked
+    child, which receives a new queue.
+
+    Returns
+    The queue to which records should be sent.
+    """
+    from atexit import register
+    from logging.handlers import QueueListener
+    from os import register_at_fork
+    from queue import SimpleQueue
+
+    LOG_LISTENER['queue'] = SimpleQueue()
+    LOG_LISTENER['listener'] = QueueListener(LOG_LISTENER['queue'], *handlers, respect_handler_level=True)
+    LOG_LISTENER['listener'].start()
+
+    if not LOG_LISTENER.get('registered'):
+        def restart_in_child():
+            from logging import getLogger
+            from logging.handlers import QueueHandler
+
+            listener = LOG_LISTENER.get('listener')
+
+            if listener is None:
+                return
+
+            # The parent's listener thread does not exist in the child, so the child's records go to a new queue
+            LOG_LISTENER['queue'] = SimpleQueue()
+            LOG_LISTENER['listener'] = QueueListener(LOG_LISTENER['queue'], *listener.handlers,
+                                                     respect_handler_level=True)
+            LOG_LISTENER['listener'].start()
+
+            for logger_name in ('harvest', 'werkzeug'):
+                for handler in getLogger(logger_name).handlers:
+                    if isinstance(handler, QueueHandler):
+                        handler.queue = LOG_LISTENER['queue']
+
+        # Writes any records still queued when the process exits
+        register(stop_log_listener)
+        register_at_fork(after_in_child=restart_in_child)
+        LOG_LISTENER['registered'] = True
+
+    return LOG_LISTENER['queue']
+
+
+def stop_log_listener() -> tuple:
+    """
+    Writes any queued records and stops the background thread.
+
+    Returns
+    tuple: The handlers the listener was writing to.
+    """
+    listener = LOG_LISTENER.pop('listener', None)
+
+    if listener is None:
+        return ()
+
+    listener.stop()
+
+    return listener.handlers
+
+
+def load_silos(silo_config: dict, timeout: float = 30) -> dict:
+    """
+    This method loads the silos from the configuration. Silos are connected concurrently, and each silo which does not
+    connect and apply its indexes within `timeout` seconds is reported as a failure without delaying the others.
 
     Arguments
     silo_config (dict): The silo configuration.
+    timeout (float, optional): The number of seconds to wait for each silo. Defaults to 30.
 
     Returns
-    dict: The silo objects.
+    dict: The result of loading each silo: 'success', 'failure', or 'timeout'.
     """
+    from concurrent.futures import ThreadPoolExecutor, wait
     from logging import getLogger
-    from CloudHarvestCoreTasks.silos import add_silo
 
     logger = getLogger('harvest')
 
+    if not silo_config:
+        return {}
+
+    executor = ThreadPoolExecutor(max_workers=len(silo_config), thread_name_prefix='load-silo')
+
+    futures = {
+        silo_name: executor.submit(load_silo, silo_name, silo_configuration)
+        for silo_name, silo_configuration in silo_config.items()
+    }
+
+    # The silos load concurrently, so waiting once for all of them bounds each silo by the same timeout
+    wait(futures.values(), timeout=timeout)
+
     results = {}
 
-    # Create the silo objects
-    for silo_name, silo_configuration in silo_config.items():
-        try:
-            new_silo_indexes = silo_configuration.pop('indexes', None)
+    for silo_name, future in futures.items():
+        if not future.done():
+            logger.error(f'{silo_name}: Did not load within {timeout} seconds.')
+            results[silo_name] = 'timeout'
 
-            new_silo = add_silo(name=silo_name, **silo_configuration)
+        else:
+            results[silo_name] = future.result()
 
-            if new_silo.is_connected:
-                logger.info(f'{silo_name}: Connected successfully.')
+    # Silos which timed out are left to finish in the background
+    executor.shutdown(wait=False)
+
+    return results
+
+
+def load_silo(silo_name: str, silo_configuration: dict) -> str:
+    """
+    Connects a single silo and applies its indexes. Indexes are only applied when their fingerprint differs from the one
+    stored by the last successful apply.
+
+    Arguments
+    silo_name (str): The name of the silo.
+    silo_configuration (dict): The silo's configuration, including its optional `indexes`.
+
+    Returns
+    str: 'success' or 'failure'.
+    """
+    from logging import getLogger
+    from CloudHarvestCoreTasks.silos import add_silo
+
+    logger = getLogger('harvest')
 
-                if new_silo_indexes:
-                    logger.info(f'{silo_name}: Adding indexes.')
-                    new_silo.add_indexes(new_silo_indexes)
+    try:
+        silo_configuration = dict(silo_configuration)
+        new_silo_indexes = silo_configuration.pop('indexes', None)
 
-                results[silo_name] = 'success'
+        new_silo = add_silo(name=silo_name, **silo_configuration)
+
+        if not new_silo.is_connected:
+            logger.error(f'Silo {silo_name} failed to connect.')
+            return 'failure'
+
+        logger.info(f'{silo_name}: Connected successfully.')
+
+        if new_silo_indexes:
+            fingerprint = get_index_fingerprint(new_silo_indexes)
+
+            if fingerprint == get_stored_index_fingerprint(new_silo):
+                logger.debug(f'{silo_name}: Indexes are up to date.')
 
             else:
-                logger.error(f'Silo {silo_name} failed to connect.')
-                results[silo_name] = 'failure'
+                logger.info(f'{silo_name}: Adding indexes.')
+                new_silo.add_indexes(new_silo_indexes)
+                store_index_fingerprint(new_silo, fingerprint)
 
-        except Exception as ex:
-            logger.error(f'Could not load silo {silo_name}: {ex.args[0]}')
-            results[silo_name] = 'failure'
+        return 'success'
 
-    return results
+    except Exception as ex:
+        logger.error(f'Could not load silo {silo_name}: {ex}')
+        return 'failure'
+
+
+# The collection in each indexed silo which records the fingerprint of the last index specification applied
+INDEX_FINGERPRINT_COLLECTION = 'silo_indexes'
+
+
+def get_index_fingerprint(indexes: dict) -> str:
+    """
+    Returns a hash of a silo's index specification which changes whenever the specification in `harvest.yaml` changes.
+    """
+    from hashlib import sha256
+    from json import dumps
+
+    return sha256(dumps(indexes, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_stored_index_fingerprint(silo) -> str or None:
+    """
+    Returns the fingerprint stored by the last successful index apply, or None if there is none or it cannot be read.
+    """
+    from logging import getLogger
+
+    try:
+        document = silo.connect()[silo.database][INDEX_FINGERPRINT_COLLECTION].find_one({'_id': silo.name})
+
+        return (document or {}).get('Fingerprint')
+
+    except Exception as ex:
+        getLogger('harvest').debug(f'{silo.name}: Could not read the index fingerprint: {ex}')
+        return None
+
+
+def store_index_fingerprint(silo, fingerprint: str):
+    """
+    Records the fingerprint of an index specification once it has been applied to the silo.
+    """
+    from datetime import datetime, timezone
+    from logging import getLogger
+
+    try:
+        silo.connect()[silo.database][INDEX_FINGERPRINT_COLLECTION].update_one(
+            {'_id': silo.name},
+            {'$set': {'Fingerprint': fingerprint, 'Updated': datetime.now(tz=timezone.utc)}},
+            upsert=True
+        )
+
+    except Exception as ex:
+        # The indexes are applied again on the next start
+        getLogger('harvest').warning(f'{silo.name}: Could not store the index fingerprint: {ex}')
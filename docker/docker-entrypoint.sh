@@ -16,6 +16,7 @@ port="8000"
 pemfile="$base_path/app/harvest-self-signed.pem"
 debug=0
 workers="${HARVEST_API_WORKERS:-5}"
+worker_class="${HARVEST_API_WORKER_CLASS:-}"
 
 # Parse command-line arguments
 while [[ "$#" -gt 0 ]]; do
@@ -25,6 +26,7 @@ while [[ "$#" -gt 0 ]]; do
         --pemfile) pemfile="$2"; shift ;;
         --debug) debug=1 ;;
         --workers) workers="$2"; shift ;;
+        --worker-class) worker_class="$2"; shift ;;
         --help)
             # Echo the launcher script's help message
             echo "$app_name Usage: [options]"
@@ -35,6 +37,7 @@ while [[ "$#" -gt 0 ]]; do
             echo "  --pemfile <file>     Path to the PEM file (default: $pemfile)"
             echo "  --debug              Launches the application using the python interpreter instead of gunicorn"
             echo "  --workers <num>      Number of gunicorn workers (default: $workers)"
+            echo "  --worker-class <cls> Gunicorn worker class, 'sync' or 'gevent' (default: api.server.worker_class in harvest.yaml)"
             echo "  --help               Show this help message"
 
             exit 0
@@ -71,9 +74,16 @@ if [[ "$debug" -eq 1 ]]; then
     && python "$base_path/$app_name" --host "$host" --port "$port" --pemfile "$pemfile" --debug
 else
     # Production mode: Use Gunicorn
+    # The worker class is read from harvest.yaml by the gunicorn configuration unless it is provided here. It is passed
+    # through the environment rather than with -k so that the configuration can decide whether to preload from it.
+    gunicorn_args=(-c "$base_path/$app_name/gunicorn.conf.py" -w "$workers" -b "$host:$port" --certfile "$pemfile" --keyfile "$pemfile")
+    if [[ -n "$worker_class" ]]; then
+        export HARVEST_API_WORKER_CLASS="$worker_class"
+    fi
+
     source "$base_path/venv/bin/activate" \
     && echo "Starting Gunicorn with $workers workers..." \
-    && gunicorn -w "$workers" -b "$host:$port" --certfile "$pemfile" --keyfile "$pemfile" "$app_name.__main__:app"
+    && gunicorn "${gunicorn_args[@]}" "$app_name.__main__:app"
 fi
 
 echo "$app_name has stopped."
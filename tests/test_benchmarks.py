@@ -0,0 +1,302 @@
+import unittest
+
+"""
+Benchmarks for the api's hot paths. The real blueprints are driven through Flask's test client while the
+`harvest-nodes`, `harvest-tasks`, `harvest-core`, and `harvest-users` silos are replaced by in-process stand-ins
+(fakeredis and mongomock).
+
+Every request is made cold: response caches and the agent directory are cleared first, so the measurements cover the
+silo queries rather than the in-process caches. Each scenario reports the p50, p95, and p99 latency and the Redis
+round trips per request of every endpoint, and compares them with `benchmark_baseline.json`:
+- Round trips may not exceed the baseline.
+- When CLOUDHARVESTAPI_BENCHMARK_CHECK_LATENCY=1, p95 latency may not exceed the baseline by more than
+  CLOUDHARVESTAPI_BENCHMARK_TOLERANCE times (default 3). Latency depends on the machine and its load, so it is only
+  reported by default.
+
+Set CLOUDHARVESTAPI_BENCHMARK_UPDATE_BASELINE=1 to write the current results as the new baseline.
+"""
+
+from importlib.util import find_spec
+from os import environ
+from os.path import abspath, dirname, join
+
+BASELINE_PATH = join(abspath(dirname(__file__)), 'benchmark_baseline.json')
+ITERATIONS = int(environ.get('CLOUDHARVESTAPI_BENCHMARK_ITERATIONS') or 20)
+TOLERANCE = float(environ.get('CLOUDHARVESTAPI_BENCHMARK_TOLERANCE') or 3)
+CHECK_LATENCY = bool(environ.get('CLOUDHARVESTAPI_BENCHMARK_CHECK_LATENCY'))
+
+# Each scenario sets the number of agents, tasks, and service templates, and the number of records in each task result
+SCENARIOS = {
+    'small': {'agents': 5, 'tasks': 100, 'templates': 20, 'result_size': 100},
+    'large': {'agents': 50, 'tasks': 2000, 'templates': 200, 'result_size': 10000},
+}
+
+PLATFORMS = ('aws', 'azure', 'gcp')
+
+
+class StandInSilo:
+    """
+    Stands in for a CloudHarvestCoreTasks silo, returning an in-process client.
+    """
+
+    def __init__(self, name: str, database, client):
+        self.name = name
+        self.database = database
+        self.client = client
+        self.is_connected = True
+
+    def connect(self):
+        return self.client
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+@unittest.skipUnless(find_spec('CloudHarvestCoreTasks') and find_spec('fakeredis') and find_spec('mongomock'),
+                     'CloudHarvestCoreTasks, fakeredis, and mongomock are required')
+class TestBenchmarks(unittest.TestCase):
+    results = {}
+
+    def setUp(self):
+        from unittest.mock import patch
+        import fakeredis
+        import mongomock
+
+        server = fakeredis.FakeServer()
+        mongo = mongomock.MongoClient()
+
+        self.silos = {
+            'harvest-nodes': StandInSilo('harvest-nodes', 0, fakeredis.FakeStrictRedis(server=server, db=0, decode_responses=True)),
+            'harvest-tasks': StandInSilo('harvest-tasks', 1, fakeredis.FakeStrictRedis(server=server, db=1, decode_responses=True)),
+            'harvest-core': StandInSilo('harvest-core', 'harvest', mongo),
+            'harvest-users': StandInSilo('harvest-users', 'users', mongo),
+        }
+
+        get_silo = self.silos.__getitem__
+
+        self.patches = [
+            patch('CloudHarvestCoreTasks.silos.get_silo', get_silo),
+            patch('CloudHarvestApi.blueprints.base.get_silo', get_silo),
+        ]
+
+        for silo_patch in self.patches:
+            silo_patch.start()
+
+        from CloudHarvestApi.blueprints.base import REDIS_CLIENTS
+        REDIS_CLIENTS.clear()
+
+    def tearDown(self):
+        for silo_patch in self.patches:
+            silo_patch.stop()
+
+    def create_app(self):
+        from flask import Flask
+        from CloudHarvestApi.blueprints import (
+            agents_blueprint,
+            home_blueprint,
+            metrics_blueprint,
+            pstar_blueprint,
+            silos_blueprint,
+            tasks_blueprint,
+            users_blueprint
+        )
+        from CloudHarvestApi.blueprints.base import HarvestJSONProvider
+
+        app = Flask('CloudHarvestApiBenchmarks')
+        app.json = HarvestJSONProvider(app)
+
+        for blueprint in (agents_blueprint, home_blueprint, metrics_blueprint, pstar_blueprint, silos_blueprint,
+                          tasks_blueprint, users_blueprint):
+            app.register_blueprint(blueprint)
+
+        return app
+
+    def load_scenario(self, agents: int, tasks: int, templates: int, result_size: int) -> list:
+        """
+        Populates the stand-in silos and returns the task chain ids of the completed tasks.
+        """
+        from json import dumps
+        from CloudHarvestApi.blueprints.tasks import enqueue_tasks, new_task, task_data_name
+
+        template_names = [
+            f'template_services/{PLATFORMS[i % len(PLATFORMS)]}.service{i}.type{i}'
+            for i in range(templates)
+        ] + [f'template_reports/{platform}.regions' for platform in PLATFORMS]
+
+        nodes = self.silos['harvest-nodes'].connect()
+
+        for i in range(agents):
+            nodes.hset(f'agent::benchmark-{i}', mapping={
+                'accounts': dumps([f'{PLATFORMS[i % len(PLATFORMS)]}:{100000 + i}']),
+                'available_templates': dumps(template_names)
+            })
+
+        self.silos['harvest-core'].connect()['harvest']['regions'].insert_many([
+            {'Platform': platform, 'Regions': [{'Region': f'{platform}-region-{r}'} for r in range(10)], 'Expires': 2e10}
+            for platform in PLATFORMS
+        ])
+
+        self.silos['harvest-users'].connect()['users']['users'].insert_many([
+            {'username': f'user{i}', 'email': f'user{i}@example.com'}
+            for i in range(1000)
+        ])
+
+        queued = [
+            new_task(priority=i % 3, task_category='services', task_name=f'aws.service{i % templates}.type{i % templates}')
+            for i in range(tasks)
+        ]
+
+        enqueue_tasks(queued)
+
+        # Half of the tasks are complete. Agents write a result to the task's data list; only the results which are
+        # read are written, since writing every one would take longer than the benchmark itself
+        tasks_client = self.silos['harvest-tasks'].connect()
+
+        completed = []
+        for task in queued[::2]:
+            tasks_client.hset(task['redis_name'], 'status', 'complete')
+            completed.append(task['id'])
+
+        result = [dumps({'Id': r, 'Name': f'resource-{r}'}) for r in range(result_size)]
+
+        for task in (queued[0], queued[::2][-1]):
+            tasks_client.rpush(task_data_name(task['redis_name']), *result)
+
+        return completed
+
+    def measure(self, client, method: str, path: str, json: dict = None) -> dict:
+        """
+        Requests `path` ITERATIONS times and returns its latency percentiles, in milliseconds, and round trips.
+        """
+        from time import perf_counter
+        from unittest.mock import patch
+        from CloudHarvestApi.blueprints import base
+        from CloudHarvestApi.blueprints.agents import agent_directory
+        from CloudHarvestApi.blueprints.metrics import record_silo_command
+
+        round_trips = []
+        latencies = []
+
+        redis_silos = [name for name, silo in self.silos.items() if isinstance(silo.database, int)]
+
+        # Every RedisRequest.execute call, including a whole pipeline, is one round trip
+        def count_round_trip(silo_name, *args, **kwargs):
+            if silo_name in redis_silos:
+                round_trips.append(1)
+
+            return record_silo_command(silo_name, *args, **kwargs)
+
+        with patch('CloudHarvestApi.blueprints.metrics.record_silo_command', count_round_trip):
+            for _ in range(ITERATIONS):
+                for cache in base.RESPONSE_CACHES.values():
+                    cache.clear()
+
+                agent_directory.invalidate()
+
+                start = perf_counter()
+                response = client.open(path, method=method, json=json)
+                response.get_data()
+                latencies.append((perf_counter() - start) * 1000)
+
+                response.close()
+
+                # Endpoints report failures as `success: false` with a 200, so a failure would otherwise be measured
+                self.assertEqual(response.status_code, 200, f'{method} {path}: {response.get_data(as_text=True)[:500]}')
+                self.assertTrue((response.get_json(silent=True) or {}).get('success'),
+                                f'{method} {path}: {response.get_data(as_text=True)[:500]}')
+
+        return {
+            'p50_ms': round(percentile(latencies, 0.5), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'round_trips': round(len(round_trips) / ITERATIONS, 2),
+        }
+
+    def run_scenario(self, scenario_name: str):
+        from flask import url_for
+
+        completed = self.load_scenario(**SCENARIOS[scenario_name])
+
+        app = self.create_app()
+        client = app.test_client()
+
+        # Paths are resolved from the endpoint names, since blueprints may be mounted under different prefixes
+        endpoints = {
+            'pstar/list_accounts': ('GET', 'pstar_bp.list_accounts', {}, None),
+            'pstar/list_platforms': ('GET', 'pstar_bp.list_platforms', {}, None),
+            'pstar/list_services': ('GET', 'pstar_bp.list_services', {}, None),
+            'pstar/list_platform_regions': ('GET', 'pstar_bp.list_platform_regions', {'platform': 'aws'}, None),
+            'pstar/list_pstar': ('GET', 'pstar_bp.list_pstar', {}, {'platform': 'aws', 'count_only': True}),
+            'pstar/list_pstar_records': ('GET', 'pstar_bp.list_pstar', {}, {'platform': 'aws'}),
+            'tasks/list_available_templates': ('GET', 'tasks_bp.list_available_templates', {}, None),
+            'tasks/list_tasks': ('GET', 'tasks_bp.list_tasks', {}, {'limit': 100, 'include': 'status,priority'}),
+            'tasks/get_task_status': ('GET', 'tasks_bp.get_task_status', {'task_chain_id': completed[0]}, None),
+            'tasks/get_task_result': ('GET', 'tasks_bp.get_task_result', {'task_chain_id': completed[-1]}, None),
+            'tasks/queue': ('POST', 'tasks_bp.queue_task',
+                            {'priority': 1, 'task_category': 'services', 'task_name': 'aws.service0.type0'}, {}),
+            'users/list': ('GET', 'users_bp.list_users', {}, {'limit': 100}),
+        }
+
+        with app.test_request_context():
+            endpoints = {
+                name: (method, url_for(endpoint, **values), json)
+                for name, (method, endpoint, values, json) in endpoints.items()
+            }
+
+        results = {
+            name: self.measure(client, method, path, json)
+            for name, (method, path, json) in endpoints.items()
+        }
+
+        TestBenchmarks.results[scenario_name] = results
+
+        print(f'\n{scenario_name} {SCENARIOS[scenario_name]}')
+        print(f'{"endpoint":<35}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"round trips":>14}')
+        for name, result in results.items():
+            print(f'{name:<35}{result["p50_ms"]:>10}{result["p95_ms"]:>10}{result["p99_ms"]:>10}{result["round_trips"]:>14}')
+
+        self.compare_with_baseline(scenario_name, results)
+
+    def compare_with_baseline(self, scenario_name: str, results: dict):
+        from json import dumps, loads
+        from os.path import exists
+
+        baseline = {}
+        if exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as baseline_file:
+                baseline = loads(baseline_file.read())
+
+        if environ.get('CLOUDHARVESTAPI_BENCHMARK_UPDATE_BASELINE'):
+            baseline[scenario_name] = results
+
+            with open(BASELINE_PATH, 'w') as baseline_file:
+                baseline_file.write(dumps(baseline, indent=2, sort_keys=True) + '\n')
+
+            return
+
+        for name, result in results.items():
+            expected = (baseline.get(scenario_name) or {}).get(name)
+
+            if not expected:
+                continue
+
+            with self.subTest(scenario=scenario_name, endpoint=name):
+                self.assertLessEqual(result['round_trips'], expected['round_trips'],
+                                     f'{name} makes more Redis round trips than the baseline')
+
+                if CHECK_LATENCY:
+                    self.assertLessEqual(result['p95_ms'], expected['p95_ms'] * TOLERANCE,
+                                         f'{name} p95 latency exceeds {TOLERANCE}x the baseline')
+
+    def test_small(self):
+        self.run_scenario('small')
+
+    def test_large(self):
+        self.run_scenario('large')
+
+
+if __name__ == '__main__':
+    unittest.main()
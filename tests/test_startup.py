@@ -0,0 +1,85 @@
+import unittest
+
+"""
+Startup time regression test. Imports `CloudHarvestApi.__main__` in a fresh interpreter, as a gunicorn worker would, and
+fails when the cold start exceeds the budget. The whole worker start is measured, including loading the silos and
+starting the heartbeat, with the Redis and Mongo clients replaced by in-process stand-ins (fakeredis and mongomock).
+Plugin installation is skipped, since it depends on the network and only happens once per host.
+
+Set CLOUDHARVESTAPI_STARTUP_BUDGET_SECONDS to change the budget.
+"""
+
+from importlib.util import find_spec
+from os import environ
+from os.path import abspath, dirname, join
+
+REPO_ROOT = abspath(join(dirname(__file__), '..'))
+STARTUP_BUDGET_SECONDS = float(environ.get('CLOUDHARVESTAPI_STARTUP_BUDGET_SECONDS') or 5)
+
+# Run in the new interpreter: replaces the database clients and the plugin install, then starts the api
+STARTUP_SCRIPT = """
+import fakeredis
+import mongomock
+import pymongo
+import redis
+
+redis.Redis = redis.StrictRedis = fakeredis.FakeStrictRedis
+pymongo.MongoClient = mongomock.MongoClient
+
+import CloudHarvestApi.startup
+CloudHarvestApi.startup.install_plugins_once = lambda *args, **kwargs: None
+
+import CloudHarvestApi.__main__
+"""
+
+
+def start_api(working_directory: str) -> tuple:
+    """
+    Imports the api in a new interpreter and returns the elapsed seconds and the interpreter's output.
+    """
+    from subprocess import run
+    from sys import executable
+    from time import perf_counter
+
+    env = dict(environ)
+    env.update({
+        'CLOUDHARVESTAPI_HOST': '127.0.0.1',
+        'CLOUDHARVESTAPI_PORT': '8000',
+
+        'CLOUDHARVESTAPI_PROFILE_STARTUP': '1',
+        'PYTHONPATH': REPO_ROOT,
+    })
+
+    start = perf_counter()
+    result = run([executable, '-c', STARTUP_SCRIPT],
+                 cwd=working_directory, env=env, capture_output=True, text=True, timeout=300)
+    elapsed = perf_counter() - start
+
+    output = result.stdout + result.stderr
+
+    if result.returncode != 0:
+        raise RuntimeError(f'CloudHarvestApi failed to start:\n{output}')
+
+    return elapsed, output
+
+
+@unittest.skipUnless(find_spec('CloudHarvestCoreTasks') and find_spec('CloudHarvestCorePluginManager')
+                     and find_spec('fakeredis') and find_spec('mongomock'),
+                     'CloudHarvestCoreTasks, CloudHarvestCorePluginManager, fakeredis, and mongomock are required')
+class TestStartup(unittest.TestCase):
+    def test_cold_start_budget(self):
+        from shutil import copy
+        from tempfile import TemporaryDirectory
+
+        # Runs from a temporary directory so that logs are not written into the repository
+        with TemporaryDirectory() as working_directory:
+            copy(join(REPO_ROOT, 'harvest.yaml'), working_directory)
+
+            elapsed, output = start_api(working_directory)
+
+        self.assertLessEqual(elapsed, STARTUP_BUDGET_SECONDS,
+                             f'Cold start took {elapsed:.3f}s, over the {STARTUP_BUDGET_SECONDS}s budget:\n{output}')
+
+
+if __name__ == '__main__':
+    unittest.main()